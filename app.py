@@ -2,30 +2,92 @@
 
 from __future__ import annotations
 
+import datetime as dt
+import hashlib
+import json
 import os
 from pathlib import Path
+from typing import Any
 
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 
-from data_fetching import get_portfolio_data
+from data_fetching import BrowserPool, get_browser_pool, get_portfolio_data
 from data_processing import compute_kpis, normalize_portfolio_payload
+from scripts.downsample import MAX_POINTS, RESOLUTIONS
+from scripts.history_store import open_store
 
 st.set_page_config(page_title="Sui Portfolio Dashboard", layout="wide")
 st.title("Sui Portfolio Dashboard")
 
 
-def load_history_totals(path: Path = Path("data/history_totals.csv")) -> pd.DataFrame:
-    if not path.exists():
-        return pd.DataFrame(columns=["date_iso", "portfolio_total", "wallet_sum", "suilend_net"])
-    hist = pd.read_csv(path)
+HISTORY_WINDOWS = {"All": None, "Last 365 days": 365, "Last 90 days": 90, "Last 30 days": 30, "Last 7 days": 7}
+HISTORY_RESOLUTIONS = ["Auto", *RESOLUTIONS]
+
+
+def file_signature(path: Path) -> tuple[str, int, int]:
+    """Cache key for ``path``: changes whenever the file is rewritten or appended to."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return str(path), -1, -1
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def load_history_totals(
+    days: int | None = None,
+    data_dir: Path = Path("data"),
+    resolution: str | None = None,
+) -> tuple[str, pd.DataFrame]:
+    """Downsampled portfolio totals for the last ``days`` days and the resolution used.
+
+    Re-queried only when the CSV changes.  Without ``resolution`` the finest
+    precomputed resolution with at most ``CHART_MAX_POINTS`` points is used.
+    """
+    start = None
+    if days is not None:
+        # Day granularity keeps the cache key stable across reruns.
+        since = dt.datetime.now(dt.timezone.utc).date() - dt.timedelta(days=days)
+        start = f"{since.isoformat()}T00:00:00Z"
+    return _query_history_totals(file_signature(data_dir / "history_totals.csv"), start, str(data_dir), resolution)
+
+
+@st.cache_resource
+def _browser_pool() -> BrowserPool:
+    """One Playwright browser for every session and rerun (Chromium starts on first use)."""
+    return get_browser_pool()
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _query_history_totals(
+    signature: tuple[str, int, int], start: str | None, data_dir: str, resolution: str | None
+) -> tuple[str, pd.DataFrame]:
+    # ``signature`` only keys the cache. The store imports just the rows appended
+    # since its last sync, so a cache miss after a daily append parses the tail only.
+    with open_store(Path(data_dir) / "history.sqlite", data_dir) as store:
+        resolution, rows = store.chart_totals(start=start, max_points=MAX_POINTS, resolution=resolution)
+    if not rows:
+        return resolution, pd.DataFrame(columns=["date_iso", "portfolio_total", "wallet_sum", "suilend_net"])
+    hist = pd.DataFrame(rows)
     if "date_iso" in hist.columns:
         hist["date_iso"] = pd.to_datetime(hist["date_iso"], errors="coerce", utc=True)
     for col in ["portfolio_total", "wallet_sum", "suilend_net"]:
         if col in hist.columns:
             hist[col] = pd.to_numeric(hist[col], errors="coerce")
-    return hist.sort_values("date_iso")
+    return resolution, hist.sort_values("date_iso")
+
+
+def payload_hash(payload: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _normalize_cached(digest: str, _payload: dict[str, Any]) -> tuple[pd.DataFrame, dict[str, float]]:
+    # Keyed on ``digest`` only; the leading underscore tells Streamlit not to hash the payload.
+    df = normalize_portfolio_payload(_payload)
+    return df, compute_kpis(df)
+
 
 with st.sidebar:
     st.header("Configuration")
@@ -35,16 +97,19 @@ with st.sidebar:
     )
     protocol = st.selectbox("Protocol (API mode)", ["cetus", "navi"], index=0)
     api_key = st.text_input("Blockvision API key (optional)", type="password", value=os.getenv("BLOCKVISION_API_KEY", ""))
+    history_window = st.selectbox("History range", list(HISTORY_WINDOWS), index=0)
+    history_resolution = st.selectbox("History resolution", HISTORY_RESOLUTIONS, index=0)
     refresh = st.button("Fetch / Refresh")
 
-if refresh or "portfolio_df" not in st.session_state:
+if refresh or "portfolio_payload" not in st.session_state:
     with st.spinner("Fetching portfolio data..."):
-        payload = get_portfolio_data(address=address, api_key=api_key or None, protocol=protocol)
-        st.session_state["portfolio_df"] = normalize_portfolio_payload(payload)
+        payload = get_portfolio_data(address=address, api_key=api_key or None, protocol=protocol, pool=_browser_pool())
+        st.session_state["portfolio_payload"] = payload
+        st.session_state["portfolio_digest"] = payload_hash(payload)
 
-if "portfolio_df" in st.session_state:
-    df = st.session_state["portfolio_df"]
-    kpis = compute_kpis(df)
+if "portfolio_payload" in st.session_state:
+    # Widget interactions rerun the script; the cached frame avoids re-normalizing.
+    df, kpis = _normalize_cached(st.session_state["portfolio_digest"], st.session_state["portfolio_payload"])
 
     k1, k2 = st.columns(2)
     k1.metric("Total Portfolio Value (USD)", f"${kpis['total_portfolio_usd']:,.2f}")
@@ -77,11 +142,17 @@ if "portfolio_df" in st.session_state:
 
     st.caption("Tip: click column headers in the table to sort; use Streamlit table search/filter controls.")
 
-    hist = load_history_totals()
+    resolution, hist = load_history_totals(
+        HISTORY_WINDOWS[history_window],
+        resolution=None if history_resolution == "Auto" else history_resolution,
+    )
     if not hist.empty:
         st.subheader("Portfolio Trend (Historical)")
-        trend_fig = px.line(hist, x="date_iso", y=["portfolio_total", "wallet_sum", "suilend_net"], markers=True)
+        trend_fig = px.line(
+            hist, x="date_iso", y=["portfolio_total", "wallet_sum", "suilend_net"], markers=len(hist) <= 200
+        )
         trend_fig.update_layout(legend_title_text="Series", yaxis_title="USD")
         st.plotly_chart(trend_fig, use_container_width=True)
+        st.caption(f"{len(hist)} points at {resolution} resolution.")
 else:
     st.info("Enter settings and click Fetch / Refresh.")
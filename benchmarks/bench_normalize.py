@@ -0,0 +1,96 @@
+"""Micro-benchmark for ``data_processing`` normalization.
+
+Compares the previous string-cleaning ``_to_float`` against the current
+dtype-aware path, and one-DataFrame-per-payload normalization against the
+batched ``normalize_portfolio_payloads``.
+
+    python benchmarks/bench_normalize.py --payloads 200 --positions 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import data_processing  # noqa: E402
+
+
+def legacy_to_float(series: pd.Series) -> pd.Series:
+    """``_to_float`` as it was before the fast path (always string-cleans)."""
+    return (
+        series.astype(str)
+        .str.replace(",", "", regex=False)
+        .str.replace("$", "", regex=False)
+        .str.strip()
+        .replace({"": None, "None": None, "-": None})
+        .astype(float)
+    )
+
+
+def make_payloads(n_payloads: int, n_positions: int, numeric: bool, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    payloads = []
+    for p in range(n_payloads):
+        items = []
+        for i in range(n_positions):
+            balance = rng.uniform(0, 1e6)
+            value = rng.uniform(0, 1e5)
+            items.append(
+                {
+                    "asset_name": f"Asset {i}",
+                    "symbol": f"T{i}",
+                    "balance": balance if numeric else f"{balance:,.4f}",
+                    "value_usd": value if numeric else f"${value:,.2f}",
+                }
+            )
+        payloads.append({"items": items, "address": f"0x{p:064x}", "_fetched_at": "2026-01-01T00:00:00Z"})
+    return payloads
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"  {label:<38} {best * 1000:9.2f} ms")
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payloads", type=int, default=200)
+    parser.add_argument("--positions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for numeric in (True, False):
+        kind = "numeric API values" if numeric else "display strings"
+        payloads = make_payloads(args.payloads, args.positions, numeric)
+        rows = args.payloads * args.positions
+        print(f"{kind}: {args.payloads} payloads x {args.positions} positions = {rows} rows")
+
+        column = pd.DataFrame([it for p in payloads for it in p["items"]])["value_usd"]
+        old = bench("_to_float (legacy)", lambda: legacy_to_float(column), args.repeat)
+        new = bench("_to_float (dtype-aware)", lambda: data_processing._to_float(column), args.repeat)
+        print(f"  speedup: {old / new:.1f}x")
+
+        per_call = bench(
+            "normalize_portfolio_payload per payload",
+            lambda: [data_processing.normalize_portfolio_payload(p) for p in payloads],
+            args.repeat,
+        )
+        batched = bench(
+            "normalize_portfolio_payloads (batched)",
+            lambda: data_processing.normalize_portfolio_payloads(payloads),
+            args.repeat,
+        )
+        print(f"  speedup: {per_call / batched:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+"""End-to-end benchmark of the daily snapshot pipeline against local stubs.
+
+Starts ``stub_servers.StubServer`` in-process, generates synthetic wallets and
+runs each pipeline stage as a subprocess in a scratch directory (the scripts
+read their configuration from the environment at import time):
+
+- ``collection``  ``sui_daily_portfolio.main`` (balances, metadata, prices)
+- ``blockvision`` ``fetch_defi_blockvision.main``
+- ``report``      ``summarize_latest.render_to_file`` as ``run_daily_snapshot`` calls it
+  (no section cache unless ``REPORT_CACHE`` is set)
+- ``history``     ``update_history.main``
+- ``dashboard``   ``portfolio_dashboard.make_dashboard``
+
+For every stage it reports wall time, stub request counts (HTTP requests and
+JSON-RPC calls per method), peak RSS of the stage process and bytes written.
+
+    python benchmarks/bench_pipeline.py --addresses 1,100,1000 --coins 200 --coins-per-address 50
+    python benchmarks/bench_pipeline.py --addresses 100 --latency 0.05 --error-rate 0.01 --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_servers import StubServer, StubState, make_addresses  # noqa: E402
+
+SCRIPTS = Path(__file__).resolve().parents[1] / 'scripts'
+
+STAGES: dict[str, str] = {
+    'collection': 'import sui_daily_portfolio as m; m.main()',
+    'blockvision': 'import fetch_defi_blockvision as m; m.main()',
+    'report': (
+        'import summarize_latest as m; '
+        "m.render_to_file('data/latest.json', 'data/latest_report.md')"
+    ),
+    'history': 'import update_history as m; m.main()',
+    'dashboard': (
+        'import portfolio_dashboard as m, pathlib; '
+        "m.DATA_DIR = pathlib.Path('data'); m.DATA_FILE = m.DATA_DIR / 'latest.json'; "
+        "m.OUT_FILE = pathlib.Path('dashboard.html'); "
+        'm.make_dashboard()'
+    ),
+}
+
+
+def tree_sizes(root: Path) -> dict[str, int]:
+    return {str(p.relative_to(root)): p.stat().st_size for p in root.rglob('*') if p.is_file()}
+
+
+def run_stage(code: str, cwd: Path, env: dict[str, str]) -> tuple[float, int, int]:
+    """Run ``code`` with the scripts on ``sys.path``; return (seconds, peak RSS KiB, exit status)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-c', f'import sys; sys.path.insert(0, {str(SCRIPTS)!r}); {code}'],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    # wait4 gives the rusage of this child alone, i.e. its own peak RSS.
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    err = proc.stderr.read().decode('utf-8', 'replace') if proc.stderr else ''
+    if proc.returncode:
+        print(err, file=sys.stderr)
+    return elapsed, rusage.ru_maxrss, proc.returncode
+
+
+def bench_size(n_addresses: int, args: argparse.Namespace) -> list[dict[str, t.Any]]:
+    state = StubState(
+        args.coins, args.coins_per_address, args.latency, args.error_rate, args.seed,
+        objects_per_address=args.objects_per_address,
+    )
+    results: list[dict[str, t.Any]] = []
+    with StubServer(state) as url, tempfile.TemporaryDirectory(prefix='suiport-bench-') as tmp:
+        work = Path(tmp)
+        (work / 'data').mkdir()
+        env = {
+            **os.environ,
+            'SUI_RPC_URL': url,
+            'COINGECKO_URL': url,
+            'BLOCKVISION_URL': url,
+            'BLOCKVISION_API_KEY': 'bench',
+            'SUI_ADDRESSES': ','.join(make_addresses(n_addresses, args.seed)),
+            'OUT_DIR': 'data',
+            'SUI_RPC_RATE': str(args.rpc_rate),
+            'SUI_RPC_WORKERS': str(args.workers),
+            'SUI_OBJECTS': '1' if args.objects_per_address else '0',
+        }
+        for stage in args.stages:
+            before_counts = state.snapshot()
+            before_files = tree_sizes(work)
+            elapsed, rss_kib, status = run_stage(STAGES[stage], work, env)
+            after_counts = state.snapshot()
+            after_files = tree_sizes(work)
+            requests = {
+                k: after_counts.get(k, 0) - before_counts.get(k, 0)
+                for k in after_counts
+                if after_counts.get(k, 0) != before_counts.get(k, 0)
+            }
+            written = sum(
+                size - before_files.get(name, 0)
+                for name, size in after_files.items()
+                if size != before_files.get(name)
+            )
+            results.append({
+                'addresses': n_addresses,
+                'stage': stage,
+                'seconds': round(elapsed, 4),
+                'peak_rss_mib': round(rss_kib / 1024, 1),
+                'http_requests': sum(v for k, v in requests.items() if k.startswith('http:')),
+                'rpc_calls': sum(v for k, v in requests.items() if k.startswith('rpc:')),
+                'requests': requests,
+                'bytes_written': written,
+                'output_bytes': sum(after_files.values()),
+                'ok': status == 0,
+            })
+    return results
+
+
+def print_table(rows: list[dict[str, t.Any]]) -> None:
+    header = f"{'addrs':>6} {'stage':<12} {'seconds':>9} {'rss MiB':>8} {'http':>7} {'rpc':>8} {'written':>12} {'ok':>3}"
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        print(
+            f"{r['addresses']:>6} {r['stage']:<12} {r['seconds']:>9.3f} {r['peak_rss_mib']:>8.1f} "
+            f"{r['http_requests']:>7} {r['rpc_calls']:>8} {r['bytes_written']:>12} {'y' if r['ok'] else 'n':>3}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the snapshot pipeline against local stub APIs')
+    parser.add_argument('--addresses', default='1,10,100', help='comma-separated wallet counts (1 to 10000)')
+    parser.add_argument('--coins', type=int, default=100, help='distinct coin types in the universe (10 to 1000)')
+    parser.add_argument('--coins-per-address', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='stub latency per HTTP request (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of an injected failure')
+    parser.add_argument(
+        '--objects-per-address', type=int, default=0,
+        help='owned objects per wallet; > 0 enables SUI_OBJECTS in the collection stage',
+    )
+    parser.add_argument('--workers', type=int, default=1, help='SUI_RPC_WORKERS for the collection stage')
+    parser.add_argument('--rpc-rate', type=float, default=0, help='SUI_RPC_RATE (0 disables the limiter)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated subset of stages')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', type=Path, help='also write results as JSON')
+    args = parser.parse_args(argv)
+    args.stages = [s for s in args.stages.split(',') if s]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f'unknown stages: {", ".join(sorted(unknown))}')
+
+    rows: list[dict[str, t.Any]] = []
+    for n in (int(x) for x in args.addresses.split(',') if x):
+        rows.extend(bench_size(n, args))
+    print_table(rows)
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+    return 0 if all(r['ok'] for r in rows) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+"""Regression check for ``sui_rpc.rpc_batch`` error handling.
+
+Replaces the HTTP transport with a scripted fullnode and checks that a
+permanent error (``-32602``) is still reported when another call of the same
+batch needs a retry, and that it is sent only once.  Also checks that
+``sui_rpc.fetch_coin_metadata`` maps such a coin type to ``None`` (cached as
+"no metadata") and leaves out one that only failed transiently.  Exits
+non-zero on failure.
+
+    python benchmarks/check_rpc_errors.py
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import typing as t
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import fetch_client  # noqa: E402
+import sui_rpc  # noqa: E402
+from coin_metadata_cache import CoinMetadataCache  # noqa: E402
+
+
+class ScriptedNode:
+    """``_post_batch`` stand-in: ``bad`` is rejected, ``flaky`` fails ``flaky_failures`` times."""
+
+    def __init__(self, flaky_failures: int = 1) -> None:
+        self.sent: list[list[str]] = []
+        self.flaky_failures = flaky_failures
+
+    def __call__(self, url: str, payload: list[dict], timeout: float) -> list[dict]:
+        self.sent.append([p['params'][0] for p in payload])
+        out = []
+        for p in payload:
+            name = p['params'][0]
+            if name == 'bad':
+                out.append({'id': p['id'], 'error': {'code': -32602, 'message': 'invalid params'}})
+            elif name == 'flaky' and self.flaky_failures:
+                self.flaky_failures -= 1
+                out.append({'id': p['id'], 'error': {'code': -32000, 'message': 'busy'}})
+            else:
+                out.append({'id': p['id'], 'result': {'name': name}})
+        return out
+
+
+def run(names: list[str]) -> tuple[list[t.Any], list[list[str]]]:
+    node = ScriptedNode()
+    sui_rpc._post_batch = node
+    calls = [('suix_getCoinMetadata', [n]) for n in names]
+    results = sui_rpc.rpc_batch(calls, url='http://scripted', return_exceptions=True, workers=1, limiter=None)
+    return results, node.sent
+
+
+def main() -> int:
+    fetch_client.sleep_backoff = lambda *args, **kwargs: None
+    failures = []
+
+    results, sent = run(['bad', 'flaky', 'ok'])
+    if not (isinstance(results[0], sui_rpc.RpcError) and results[0].permanent):
+        failures.append(f'mixed batch: permanent error lost, got {results[0]!r}')
+    if results[1:] != [{'name': 'flaky'}, {'name': 'ok'}]:
+        failures.append(f'mixed batch: unexpected results {results[1:]!r}')
+    if sent != [['bad', 'flaky', 'ok'], ['flaky']]:
+        failures.append(f'mixed batch: unexpected requests {sent!r}')
+
+    results, sent = run(['bad', 'ok'])
+    if not isinstance(results[0], sui_rpc.RpcError) or sent != [['bad', 'ok']]:
+        failures.append(f'permanent only: got {results!r} after {sent!r}')
+
+    node = ScriptedNode(flaky_failures=3)
+    sui_rpc._post_batch = node
+    metas = sui_rpc.fetch_coin_metadata(['bad', 'flaky', 'ok'], url='http://scripted')
+    if metas != {'bad': None, 'ok': {'name': 'ok'}}:
+        failures.append(f'fetch_coin_metadata: got {metas!r}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CoinMetadataCache(Path(tmp) / 'coin_metadata_cache.json')
+        node = ScriptedNode(flaky_failures=3)
+        sui_rpc._post_batch = node
+        fetch = lambda cts: sui_rpc.fetch_coin_metadata(cts, url='http://scripted')  # noqa: E731
+        cache.resolve(['bad', 'flaky', 'ok'], fetch)
+        node.sent.clear()
+        cache.resolve(['bad', 'flaky', 'ok'], fetch)
+        if node.sent != [['flaky']]:
+            failures.append(f'metadata cache: warm run sent {node.sent!r}')
+
+    for failure in failures:
+        print('FAIL', failure)
+    print('ok' if not failures else f'{len(failures)} failure(s)')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
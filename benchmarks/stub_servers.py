@@ -0,0 +1,404 @@
+"""Local stand-ins for the Sui fullnode, CoinGecko and Blockvision.
+
+One threaded HTTP server answers all three APIs:
+
+- ``POST /``                              Sui JSON-RPC (single or batch):
+  ``suix_getAllBalances``, ``suix_getCoinMetadata`` and
+  ``suix_queryTransactionBlocks`` (a stable digest per address and filter),
+  ``suix_getOwnedObjects`` (cursor-paginated) and ``sui_multiGetObjects``,
+  plus the checkpoint feed ``sui_getLatestCheckpointSequenceNumber``,
+  ``sui_getCheckpoints`` and ``sui_multiGetTransactionBlocks``
+- ``POST /stub/emit``                     append a checkpoint with transactions
+  touching ``{"addresses": [...], "noise": n}`` (test event source)
+- ``GET /api/v3/simple/price``            CoinGecko ``simple/price``
+- ``GET /v2/sui/account/defiPortfolio``   Blockvision DeFi portfolio
+- ``GET /v1/account/<address>``           protocol APIs (Suilend, Cetus, Aftermath)
+
+Wallet contents are derived from the address with a seeded RNG, so any number
+of synthetic addresses can be served without holding them in memory.  Each
+HTTP request sleeps ``latency`` seconds; with probability ``error_rate`` a
+request fails with HTTP 500 and each JSON-RPC batch element fails with an
+RPC error; with probability ``throttle_rate`` it is answered with HTTP 429 and
+``Retry-After: <retry_after>``.  The Blockvision and protocol responses carry
+an ``ETag`` and answer a matching ``If-None-Match`` with ``304 Not Modified``.
+Per-method and per-endpoint counts are kept in ``counts``.
+
+``emit`` simulates chain activity: every emitted transaction bumps the
+version of the addresses it touches, which changes their balances and their
+newest transaction digest, and is listed in a new checkpoint.
+
+    python benchmarks/stub_servers.py --port 18545 --coins 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import typing as t
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Symbols that map to CoinGecko ids in sui_daily_portfolio.CG_IDS, so some
+# synthetic coins get priced.
+PRICED_SYMBOLS = ['SUI', 'USDC', 'USDT', 'SOL', 'HASUI', 'VSUI']
+
+OBJECT_TYPES = [
+    '0x2::coin::Coin<0x2::sui::SUI>',
+    '0x3::staking_pool::StakedSui',
+    '0x1eabed72c53feb3805120a081dc15963c204dc8d091542592abaf7a35689b2fb::position::Position',
+]
+
+
+def make_addresses(n: int, seed: int = 1) -> list[str]:
+    """``n`` distinct addresses whose 10-character prefixes are also distinct."""
+    out = []
+    for i in range(n):
+        digest = hashlib.sha256(f'{seed}:{i}'.encode()).hexdigest()
+        out.append(f'0x{digest}')
+    return out
+
+
+def coin_type(i: int) -> str:
+    if i == 0:
+        return '0x2::sui::SUI'
+    return f'0x{i:064x}::coin{i}::COIN{i}'
+
+
+def coin_symbol(i: int) -> str:
+    return PRICED_SYMBOLS[i] if i < len(PRICED_SYMBOLS) else f'COIN{i}'
+
+
+def object_type(object_id: str) -> str:
+    return OBJECT_TYPES[int(object_id[2:6], 16) % len(OBJECT_TYPES)]
+
+
+class StubState:
+    """Configuration and counters shared by all handler threads."""
+
+    def __init__(
+        self,
+        coins: int = 100,
+        coins_per_address: int = 20,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 1,
+        objects_per_address: int = 0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+    ) -> None:
+        self.coins = max(1, coins)
+        self.objects_per_address = max(0, objects_per_address)
+        self.coins_per_address = max(1, min(coins_per_address, self.coins))
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.counts: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.versions: Counter[str] = Counter()
+        # Checkpoint sequence number = list index; checkpoint 0 is empty.
+        self.checkpoints: list[list[str]] = [[]]
+        self.tx_blocks: dict[str, dict] = {}
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.counts[key] += n
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.counts)
+
+    def fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def throttle(self) -> bool:
+        if self.throttle_rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < self.throttle_rate
+
+    def emit(self, addresses: t.Iterable[str], noise: int = 0) -> int:
+        """Add a checkpoint with one transaction per address (plus ``noise``
+        transactions between unrelated addresses); return its sequence number."""
+        with self.lock:
+            seq = len(self.checkpoints)
+            digests = []
+            touched = [(a, a) for a in addresses]
+            touched += [(f'0x{self.rng.getrandbits(256):064x}', f'0x{self.rng.getrandbits(256):064x}') for _ in range(noise)]
+            for i, (sender, recipient) in enumerate(touched):
+                digest = hashlib.sha256(f'{self.seed}:cp{seq}:{i}'.encode()).hexdigest()
+                self.versions[sender] += 1
+                if recipient != sender:
+                    self.versions[recipient] += 1
+                self.tx_blocks[digest] = {
+                    'digest': digest,
+                    'checkpoint': str(seq),
+                    'transaction': {'data': {'sender': sender}},
+                    'balanceChanges': [
+                        {'owner': {'AddressOwner': sender}, 'coinType': '0x2::sui::SUI', 'amount': '-1000'},
+                        {'owner': {'AddressOwner': recipient}, 'coinType': '0x2::sui::SUI', 'amount': '1000'},
+                    ],
+                }
+                digests.append(digest)
+            self.checkpoints.append(digests)
+            return seq
+
+    def checkpoint_page(self, cursor: str | None, limit: int | None, descending: bool) -> dict:
+        with self.lock:
+            seqs = list(range(len(self.checkpoints)))
+            if descending:
+                seqs.reverse()
+            if cursor is not None:
+                c = int(cursor)
+                seqs = [s for s in seqs if (s < c if descending else s > c)]
+            page = seqs[:limit or 50]
+            data = [
+                {'sequenceNumber': str(s), 'digest': f'cp{s}', 'transactions': list(self.checkpoints[s])}
+                for s in page
+            ]
+        more = len(seqs) > len(page)
+        return {'data': data, 'nextCursor': data[-1]['sequenceNumber'] if data else None, 'hasNextPage': more}
+
+    def version(self, address: str) -> int:
+        with self.lock:
+            return self.versions[address]
+
+    def balances(self, address: str) -> list[dict]:
+        v = self.version(address)
+        rng = random.Random(f'{self.seed}:{address}:{v}' if v else f'{self.seed}:{address}')
+        picks = sorted(rng.sample(range(self.coins), self.coins_per_address))
+        return [
+            {
+                'coinType': coin_type(i),
+                'coinObjectCount': rng.randint(1, 5),
+                'totalBalance': str(rng.randrange(0, 10 ** 12)),
+                'lockedBalance': {},
+            }
+            for i in picks
+        ]
+
+    def metadata(self, ctype: str) -> dict | None:
+        if ctype == '0x2::sui::SUI':
+            i = 0
+        else:
+            try:
+                i = int(ctype.split('::', 1)[0], 16)
+            except ValueError:
+                return None
+        if i % 17 == 16:  # some coins have no metadata, like on mainnet
+            return None
+        sym = coin_symbol(i)
+        return {'decimals': 9, 'name': sym.title(), 'symbol': sym, 'description': '', 'iconUrl': None, 'id': None}
+
+    def owned_objects(self, address: str, cursor: str | None, limit: int | None) -> dict:
+        start = int(cursor or 0)
+        end = min(self.objects_per_address, start + (limit or 50))
+        data = []
+        for i in range(start, end):
+            oid = '0x' + hashlib.sha256(f'{self.seed}:{address}:{i}'.encode()).hexdigest()
+            data.append({'data': {'objectId': oid, 'version': '1', 'digest': oid[2:46], 'type': object_type(oid)}})
+        more = end < self.objects_per_address
+        return {'data': data, 'nextCursor': str(end) if more else None, 'hasNextPage': more}
+
+    def objects(self, object_ids: list[str]) -> list[dict]:
+        return [
+            {'data': {
+                'objectId': oid,
+                'version': '1',
+                'digest': oid[2:46],
+                'type': object_type(oid),
+                'content': {
+                    'dataType': 'moveObject',
+                    'type': object_type(oid),
+                    'hasPublicTransfer': True,
+                    'fields': {'id': {'id': oid}, 'principal': str(int(oid[2:10], 16))},
+                },
+            }}
+            for oid in object_ids
+        ]
+
+    def transactions(self, query: dict) -> dict:
+        versions = [self.version(a) for a in (query.get('filter') or {}).values() if isinstance(a, str)]
+        digest = hashlib.sha256(f'{self.seed}:{json.dumps(query, sort_keys=True)}:{versions}'.encode()).hexdigest()
+        return {'data': [{'digest': digest}], 'nextCursor': digest, 'hasNextPage': True}
+
+    def rpc(self, call: dict) -> dict:
+        method = call.get('method', '')
+        params = call.get('params') or []
+        self.count(f'rpc:{method}')
+        base = {'jsonrpc': '2.0', 'id': call.get('id')}
+        if self.fail():
+            return {**base, 'error': {'code': -32000, 'message': 'stub injected error'}}
+        if method == 'suix_getAllBalances':
+            return {**base, 'result': self.balances(params[0])}
+        if method == 'suix_getCoinMetadata':
+            return {**base, 'result': self.metadata(params[0])}
+        if method == 'suix_getOwnedObjects':
+            return {**base, 'result': self.owned_objects(params[0], *(list(params[2:4]) + [None, None])[:2])}
+        if method == 'sui_multiGetObjects':
+            return {**base, 'result': self.objects(params[0])}
+        if method == 'suix_queryTransactionBlocks':
+            return {**base, 'result': self.transactions(params[0])}
+        if method == 'sui_getLatestCheckpointSequenceNumber':
+            with self.lock:
+                return {**base, 'result': str(len(self.checkpoints) - 1)}
+        if method == 'sui_getCheckpoints':
+            return {**base, 'result': self.checkpoint_page(*(list(params[:3]) + [None, None, False])[:3])}
+        if method == 'sui_multiGetTransactionBlocks':
+            with self.lock:
+                return {**base, 'result': [self.tx_blocks[d] for d in params[0] if d in self.tx_blocks]}
+        return {**base, 'error': {'code': -32601, 'message': f'method {method} not supported by stub'}}
+
+
+def make_handler(state: StubState) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def _send(self, status: int, obj: t.Any, headers: dict[str, str] | None = None) -> None:
+            body = json.dumps(obj).encode('utf-8')
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_tagged(self, key: str, obj: t.Any) -> None:
+            """Send ``obj`` with an ``ETag``, or a bare 304 if the client already has it."""
+            etag = '"' + hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()[:16] + '"'
+            if self.headers.get('If-None-Match') == etag:
+                state.count(f'http_not_modified:{key}')
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self._send(200, obj, {'ETag': etag})
+
+        def _begin(self, key: str) -> bool:
+            state.count(f'http:{key}')
+            if state.latency:
+                time.sleep(state.latency)
+            if state.throttle():
+                state.count(f'http_throttled:{key}')
+                self._send(429, {'error': 'stub throttled'}, {'Retry-After': f'{state.retry_after:g}'})
+                return False
+            if state.fail():
+                state.count(f'http_error:{key}')
+                self._send(500, {'error': 'stub injected failure'})
+                return False
+            return True
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server API
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'null')
+            if self.path == '/stub/emit':
+                payload = payload or {}
+                seq = state.emit(payload.get('addresses') or [], int(payload.get('noise') or 0))
+                self._send(200, {'checkpoint': seq})
+                return
+            if not self._begin('rpc'):
+                return
+            if isinstance(payload, list):
+                self._send(200, [state.rpc(c) for c in payload])
+            else:
+                self._send(200, state.rpc(payload or {}))
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            parts = urllib.parse.urlsplit(self.path)
+            query = urllib.parse.parse_qs(parts.query)
+            if parts.path == '/api/v3/simple/price':
+                if not self._begin('coingecko'):
+                    return
+                ids = (query.get('ids') or [''])[0].split(',')
+                rng = random.Random(state.seed)
+                self._send(200, {i: {'usd': round(rng.uniform(0.5, 5), 4)} for i in ids if i})
+            elif parts.path == '/v2/sui/account/defiPortfolio':
+                if not self._begin('blockvision'):
+                    return
+                addr = (query.get('address') or [''])[0]
+                items = [
+                    {'asset_name': b['coinType'].split('::')[-1], 'symbol': b['coinType'].split('::')[-1],
+                     'balance': b['totalBalance'], 'value_usd': '1.0'}
+                    for b in state.balances(addr)[:5]
+                ]
+                self._send_tagged('blockvision', {'code': 200, 'message': 'OK', 'result': {'data': items}})
+            elif parts.path.startswith('/v1/account/'):
+                if not self._begin('protocol'):
+                    return
+                addr = parts.path.rsplit('/', 1)[-1]
+                rng = random.Random(f'{state.seed}:{addr}:{state.version(addr)}')
+                self._send_tagged('protocol', {'address': addr, 'positions': [
+                    {'market': f'MARKET{i}', 'value_usd': round(rng.uniform(0, 1000), 2)} for i in range(3)
+                ]})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def log_message(self, *args: t.Any) -> None:
+            pass
+
+    return Handler
+
+
+class StubServer:
+    """Run the stub in a background thread: ``with StubServer(state) as url: ...``."""
+
+    def __init__(self, state: StubState, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.state = state
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(state))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc: object) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve stub Sui RPC / CoinGecko / Blockvision APIs')
+    parser.add_argument('--port', type=int, default=18545)
+    parser.add_argument('--coins', type=int, default=100)
+    parser.add_argument('--coins-per-address', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per HTTP request')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--objects-per-address', type=int, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429')
+    args = parser.parse_args(argv)
+    state = StubState(
+        args.coins, args.coins_per_address, args.latency, args.error_rate,
+        objects_per_address=args.objects_per_address,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+    )
+    server = StubServer(state, port=args.port)
+    print(f'stub listening on {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -4,27 +4,90 @@ Strategy:
 1) Try a documented API first (Blockvision public API product family used by Suivision).
 2) Fallback to browser scraping with Playwright when API is unavailable.
 
-This module is intentionally stateless and returns plain Python dictionaries
-that can be normalized downstream.
+This module returns plain Python dictionaries that can be normalized downstream.
+The only shared state is a pooled ``requests.Session``, so repeated fetches reuse
+kept-alive TCP/TLS connections instead of re-handshaking on every call.
+With ``HTTP_ARCHIVE_MODE=record``/``replay`` (see ``scripts/http_archive.py``)
+the session and the Playwright fallback record to, or answer from, the archive.
 """
 
 from __future__ import annotations
 
+import atexit
+import concurrent.futures
 import datetime as dt
 import logging
+import os
+import queue
 import re
+import threading
 from dataclasses import dataclass
 from typing import Any
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
+# One module (and one ``_ARCHIVE``) with the scripts' ``import http_archive``.
+try:
+    import http_archive
+except ImportError:  # scripts/ not on sys.path (app.py)
+    from scripts import http_archive
+
 LOGGER = logging.getLogger(__name__)
 
 # Based on publicly documented Blockvision v2 API family.
 BLOCKVISION_DEFI_URL = "https://api.blockvision.org/v2/sui/account/defiPortfolio"
 
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "4"))
+
+
+class ArchiveAdapter(HTTPAdapter):
+    """``HTTPAdapter`` that records exchanges to, or replays them from, the HTTP archive."""
+
+    def send(self, request, **kwargs):  # type: ignore[override]
+        archive = http_archive.active_archive()
+        if archive is None:
+            return super().send(request, **kwargs)
+        if http_archive.replaying():
+            try:
+                status, reason, headers, data = archive.get(request.method, request.url, request.body)
+            except http_archive.ArchiveMiss as e:
+                raise requests.ConnectionError(str(e), request=request) from e
+            response = requests.Response()
+            response.status_code = status
+            response.reason = reason
+            response.headers = CaseInsensitiveDict(headers)
+            response._content = data
+            response.url = request.url
+            response.request = request
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            return response
+        response = super().send(request, **kwargs)
+        archive.put(
+            request.method,
+            request.url,
+            request.body,
+            response.status_code,
+            response.reason or "",
+            list(response.headers.items()),
+            response.content,
+        )
+        return response
+
+
+def _make_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = ArchiveAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = _make_session()
+
 
 @dataclass
 class FetchConfig:
@@ -62,7 +125,7 @@ def fetch_via_blockvision_api(
         "User-Agent": cfg.user_agent,
         "Accept": "application/json",
     }
-    response = requests.get(
+    response = SESSION.get(
         BLOCKVISION_DEFI_URL,
         params={"address": address, "protocol": protocol},
         headers=headers,
@@ -91,7 +154,7 @@ def fetch_via_suivision_scrape(address: str, config: FetchConfig | None = None)
     url = f"https://suivision.xyz/account/{address}?tab=Portfolio"
 
     headers = {"User-Agent": cfg.user_agent}
-    res = requests.get(url, headers=headers, timeout=cfg.timeout_seconds)
+    res = SESSION.get(url, headers=headers, timeout=cfg.timeout_seconds)
     res.raise_for_status()
 
     soup = BeautifulSoup(res.text, "html.parser")
@@ -125,38 +188,186 @@ def fetch_via_suivision_scrape(address: str, config: FetchConfig | None = None)
     }
 
 
-def fetch_via_suivision_playwright(address: str) -> dict[str, Any]:
-    """JS-rendered fallback using Playwright.
+SUIVISION_PORTFOLIO_URL = "https://suivision.xyz/account/{address}?tab=Portfolio"
 
-    Requires: `playwright install chromium`
+# Resource types the portfolio table does not need; aborting them keeps page loads short.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+
+# One in-page evaluation returns every row's cell texts instead of 4 IPC calls per row.
+_TABLE_JS = "rows => rows.map(r => Array.from(r.querySelectorAll('td'), td => td.innerText.trim()))"
+
+
+def _rows_to_records(rows: list[list[str]]) -> list[dict[str, Any]]:
+    return [
+        {
+            "asset_name": cells[0],
+            "symbol": cells[1],
+            "balance": cells[2],
+            "value_usd": cells[3].replace("$", ""),
+        }
+        for cells in rows
+        if len(cells) >= 4
+    ]
+
+
+class BrowserPool:
+    """Long-lived headless Chromium that scrapes many addresses in one session.
+
+    The browser is launched lazily on first use and kept until ``close()``;
+    each scrape reuses one page in a shared context whose router aborts
+    images, fonts and media. Playwright's sync API is bound to the thread
+    that started it, so every Playwright call runs on the pool's own worker
+    thread: ``scrape`` and ``close`` may be called from any thread (such as
+    Streamlit's per-rerun script threads or an ``atexit`` hook) and are
+    serialized there. ``get_browser_pool()`` returns the process-wide pool.
     """
-    from playwright.sync_api import sync_playwright
 
-    url = f"https://suivision.xyz/account/{address}?tab=Portfolio"
-    records: list[dict[str, Any]] = []
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(url, wait_until="networkidle", timeout=60_000)
-
-        # Use role/text-aware selectors instead of brittle CSS hashes.
-        rows = page.locator("table tbody tr")
-        for i in range(rows.count()):
-            cells = rows.nth(i).locator("td")
-            if cells.count() < 4:
+    def __init__(self, blocked_resource_types: frozenset[str] = BLOCKED_RESOURCE_TYPES, timeout_ms: int = 60_000):
+        self.blocked_resource_types = blocked_resource_types
+        self.timeout_ms = timeout_ms
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._jobs: queue.Queue | None = None
+
+    @staticmethod
+    def _serve(jobs: queue.Queue) -> None:
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            fn, args, future = job
+            if not future.set_running_or_notify_cancel():
                 continue
-            records.append(
-                {
-                    "asset_name": cells.nth(0).inner_text().strip(),
-                    "symbol": cells.nth(1).inner_text().strip(),
-                    "balance": cells.nth(2).inner_text().strip(),
-                    "value_usd": cells.nth(3).inner_text().strip().replace("$", ""),
-                }
-            )
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:  # noqa: BLE001 - handed to the caller
+                future.set_exception(e)
+
+    def _call(self, fn, *args):
+        """Run ``fn(*args)`` on the worker thread (started on demand) and return its result."""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            if self._worker is None:
+                self._jobs = queue.Queue()
+                self._worker = threading.Thread(target=self._serve, args=(self._jobs,), name="playwright", daemon=True)
+                self._worker.start()
+            self._jobs.put((fn, args, future))
+        return future.result()
+
+    def _ensure_page(self):
+        if self._page is not None and not self._page.is_closed():
+            return self._page
+        if self._browser is None or not self._browser.is_connected():
+            from playwright.sync_api import sync_playwright
+
+            if self._playwright is None:
+                self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=True)
+            self._context = None
+        if self._context is None:
+            self._context = self._browser.new_context()
+            self._context.route("**/*", self._route)
+        self._page = self._context.new_page()
+        return self._page
+
+    def _route(self, route) -> None:
+        if route.request.resource_type in self.blocked_resource_types:
+            route.abort()
+        else:
+            route.continue_()
+
+    def _scrape(self, address: str) -> list[dict[str, Any]]:
+        page = self._ensure_page()
+        page.goto(SUIVISION_PORTFOLIO_URL.format(address=address), wait_until="domcontentloaded", timeout=self.timeout_ms)
+        try:
+            page.wait_for_selector("table tbody tr", timeout=self.timeout_ms)
+        except Exception:  # noqa: BLE001 - no table rendered; caller reports no rows
+            return []
+        return _rows_to_records(page.eval_on_selector_all("table tbody tr", _TABLE_JS))
+
+    def scrape(self, address: str) -> list[dict[str, Any]]:
+        """Return the portfolio table rows for ``address`` (may be empty)."""
+        return self._call(self._scrape, address)
+
+    def scrape_many(self, addresses: list[str]) -> dict[str, list[dict[str, Any]]]:
+        """Scrape several addresses in the same browser session."""
+        return {address: self.scrape(address) for address in addresses}
+
+    def _close(self) -> None:
+        for obj in (self._context, self._browser):
+            if obj is not None:
+                try:
+                    obj.close()
+                except Exception:  # noqa: BLE001 - best effort during shutdown
+                    pass
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:  # noqa: BLE001 - best effort during shutdown
+                pass
+        self._playwright = self._browser = self._context = self._page = None
+
+    def close(self, timeout: float | None = None) -> None:
+        """Close the browser on the worker thread and stop the worker."""
+        with self._lock:
+            worker, jobs = self._worker, self._jobs
+            self._worker = self._jobs = None
+        if worker is None:
+            return
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        jobs.put((self._close, (), future))
+        jobs.put(None)
+        try:
+            future.result(timeout)
+        except Exception:  # noqa: BLE001 - best effort during shutdown
+            pass
+        worker.join(timeout)
+
+    def __enter__(self) -> "BrowserPool":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+_POOL: BrowserPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide warm ``BrowserPool``; closed automatically at exit."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = BrowserPool()
+        return _POOL
+
 
-        browser.close()
+@atexit.register
+def _close_browser_pool() -> None:
+    if _POOL is not None:
+        _POOL.close(timeout=10)
 
+
+def fetch_via_suivision_playwright(address: str, pool: BrowserPool | None = None) -> dict[str, Any]:
+    """JS-rendered fallback using a warm Playwright browser.
+
+    Requires: `playwright install chromium`
+    """
+    archive = http_archive.active_archive()
+    if archive is not None and http_archive.replaying():
+        try:
+            records = archive.get_json("PLAYWRIGHT", address)
+        except http_archive.ArchiveMiss as e:
+            raise DataFetchError(str(e)) from e
+    else:
+        records = (pool or get_browser_pool()).scrape(address)
+        if archive is not None:
+            archive.put_json("PLAYWRIGHT", address, records)
     if not records:
         raise DataFetchError("Playwright could not locate portfolio table rows.")
 
@@ -168,8 +379,13 @@ def fetch_via_suivision_playwright(address: str) -> dict[str, Any]:
     }
 
 
-def get_portfolio_data(address: str, api_key: str | None = None, protocol: str = "cetus") -> dict[str, Any]:
-    """Primary orchestrator: API first, scraping fallback."""
+def get_portfolio_data(
+    address: str,
+    api_key: str | None = None,
+    protocol: str = "cetus",
+    pool: BrowserPool | None = None,
+) -> dict[str, Any]:
+    """Primary orchestrator: API first, scraping fallback (Playwright through ``pool``)."""
     if api_key:
         try:
             return fetch_via_blockvision_api(address=address, api_key=api_key, protocol=protocol)
@@ -180,4 +396,4 @@ def get_portfolio_data(address: str, api_key: str | None = None, protocol: str =
         return fetch_via_suivision_scrape(address)
     except Exception as exc:  # noqa: BLE001
         LOGGER.warning("Static scrape failed, trying Playwright: %s", exc)
-        return fetch_via_suivision_playwright(address)
+        return fetch_via_suivision_playwright(address, pool)
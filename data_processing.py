@@ -13,29 +13,54 @@ REQUIRED_COLUMNS = [
 ]
 
 
-def _to_float(series: pd.Series) -> pd.Series:
+_SENTINELS = {"": None, "None": None, "-": None}
+
+
+def _clean_strings(series: pd.Series) -> pd.Series:
     return (
         series.astype(str)
         .str.replace(",", "", regex=False)
         .str.replace("$", "", regex=False)
         .str.strip()
-        .replace({"": None, "None": None, "-": None})
+        .replace(_SENTINELS)
         .astype(float)
     )
 
 
-def normalize_portfolio_payload(payload: dict) -> pd.DataFrame:
-    """Create clean dataframe with canonical fields for dashboard analytics."""
-    raw_items = payload.get("items", payload.get("data", []))
-    df = pd.DataFrame(raw_items)
+def _to_float(series: pd.Series) -> pd.Series:
+    """Parse a column of API numbers or display strings like ``"$1,234.5"`` to float.
+
+    Numeric columns are cast directly and string columns are cleaned in one
+    vectorized pass. Mixed object columns parse real numbers with
+    ``to_numeric`` and only string-clean the values that did not parse.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return _clean_strings(series)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) == "string":
+        return _clean_strings(series)
+    parsed = pd.to_numeric(series, errors="coerce").astype(float)
+    rest = parsed.isna() & series.notna()
+    if rest.any():
+        parsed[rest] = _clean_strings(series[rest])
+    return parsed
+
 
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
     for col in REQUIRED_COLUMNS:
         if col not in df.columns:
             df[col] = None
+    out = df[REQUIRED_COLUMNS].copy()
+    out["balance"] = _to_float(out["balance"])
+    out["value_usd"] = _to_float(out["value_usd"])
+    return out
 
-    df = df[REQUIRED_COLUMNS].copy()
-    df["balance"] = _to_float(df["balance"])
-    df["value_usd"] = _to_float(df["value_usd"])
+
+def normalize_portfolio_payload(payload: dict) -> pd.DataFrame:
+    """Create clean dataframe with canonical fields for dashboard analytics."""
+    raw_items = payload.get("items", payload.get("data", []))
+    df = _normalize_frame(pd.DataFrame(raw_items))
 
     total_value = df["value_usd"].sum(min_count=1)
     if pd.notna(total_value) and total_value > 0:
@@ -48,6 +73,31 @@ def normalize_portfolio_payload(payload: dict) -> pd.DataFrame:
     return df
 
 
+def normalize_portfolio_payloads(payloads: list[dict]) -> pd.DataFrame:
+    """Normalize many payloads (e.g. one per address) with a single DataFrame build.
+
+    Items from all payloads are concatenated once and parsed in one pass.
+    ``portfolio_pct`` is computed within each payload, and ``address`` and
+    ``fetched_at`` come from the payload each row belongs to. Rows keep payload
+    order and are sorted by ``value_usd`` within each payload.
+    """
+    records: list[dict] = []
+    owners: list[int] = []
+    for i, payload in enumerate(payloads):
+        items = payload.get("items", payload.get("data", [])) or []
+        records.extend(items)
+        owners.extend([i] * len(items))
+    df = _normalize_frame(pd.DataFrame(records))
+    df["_payload"] = owners
+
+    totals = df.groupby("_payload")["value_usd"].transform(lambda s: s.sum(min_count=1))
+    df["portfolio_pct"] = ((df["value_usd"] / totals) * 100).where(totals > 0, 0.0)
+    df["fetched_at"] = df["_payload"].map(lambda i: payloads[i].get("_fetched_at"))
+    df["address"] = df["_payload"].map(lambda i: payloads[i].get("address"))
+    df = df.sort_values(["_payload", "value_usd"], ascending=[True, False], na_position="last")
+    return df.drop(columns="_payload").reset_index(drop=True)
+
+
 def compute_kpis(df: pd.DataFrame) -> dict[str, float]:
     return {
         "total_portfolio_usd": float(df["value_usd"].sum(min_count=1) or 0.0),
@@ -0,0 +1,213 @@
+"""Delta-encoded per-address balance log.
+
+``portfolio_<prefix>.csv`` stores every balance on every run, so most of its
+rows repeat the previous snapshot.  The delta log (``balances_<prefix>.csv``)
+stores the same information much more compactly:
+
+- a *keyframe* (``kind=K``) lists every coin type, and is written on the first
+  run and whenever the last keyframe is older than ``BALANCE_LOG_KEYFRAME_DAYS``
+  (default 7);
+- otherwise only coin types whose raw balance changed (or that appeared) are
+  written as ``kind=D`` rows, and coin types that vanished from
+  ``suix_getAllBalances`` are written as ``kind=X`` rows.
+
+``balances_at`` rebuilds the full balance set for any timestamp by replaying
+from the last keyframe at or before it.  ``append_snapshot`` reads the log
+backwards from its end to the start of the last keyframe, so a daily append
+costs at most one keyframe period of rows however long the log grows.  ``python scripts/balance_log.py
+convert data/portfolio_<prefix>.csv`` turns an existing full log into a delta
+log.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import os
+import sys
+import typing as t
+from pathlib import Path
+
+KEYFRAME_DAYS = float(os.environ.get('BALANCE_LOG_KEYFRAME_DAYS', 7))
+# First tail read of ``read_tail``; grown 4x until it reaches the last keyframe.
+TAIL_BLOCK = 64 * 1024
+FIELDS = ['date_iso', 'kind', 'coin_type', 'symbol', 'decimals', 'raw_balance']
+
+State = t.Dict[str, t.Dict[str, str]]
+
+
+def _parse_iso(value: str) -> dt.datetime:
+    return dt.datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _replay(
+    rows: t.Iterable[dict],
+    until: str | None = None,
+    state: State | None = None,
+    keyframe_date: str | None = None,
+) -> tuple[State, str | None]:
+    """Apply log rows (up to ``until`` inclusive); return ``(state, last keyframe date)``."""
+    state = dict(state or {})
+    for row in rows:
+        date_iso = row['date_iso']
+        if until is not None and date_iso > until:
+            break
+        kind = row['kind']
+        if kind == 'K':
+            if date_iso != keyframe_date:
+                state = {}
+                keyframe_date = date_iso
+            state[row['coin_type']] = row
+        elif kind == 'D':
+            state[row['coin_type']] = row
+        elif kind == 'X':
+            state.pop(row['coin_type'], None)
+    return state, keyframe_date
+
+
+def read_log(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with path.open(newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def read_tail(path: Path, block: int = TAIL_BLOCK) -> list[dict]:
+    """Rows from the first row of the last keyframe to the end of the log."""
+    if not path.exists():
+        return []
+    size = path.stat().st_size
+    with path.open('rb') as f:
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            # Split before decoding: the seek may land inside a multi-byte
+            # character, but only in the first line, which is dropped along
+            # with the header.
+            lines = [line.decode('utf-8') for line in f.read().split(b'\n')[1:] if line]
+            rows = list(csv.DictReader(lines, fieldnames=FIELDS))
+            last = next((i for i in range(len(rows) - 1, -1, -1) if rows[i]['kind'] == 'K'), None)
+            if last is not None:
+                first = last
+                date_iso = rows[last]['date_iso']
+                while first > 0 and rows[first - 1]['kind'] == 'K' and rows[first - 1]['date_iso'] == date_iso:
+                    first -= 1
+                if first > 0 or start == 0:
+                    return rows[first:]
+            elif start == 0:
+                return rows
+            block *= 4
+
+
+def balances_at(path: Path, when: str | None = None) -> list[dict]:
+    """Full balance set recorded at or before ``when`` (latest if ``None``).
+
+    Rows carry ``date_iso`` of the change that produced them, plus
+    ``coin_type``, ``symbol``, ``decimals`` and ``raw_balance``.
+    """
+    state, _ = _replay(read_log(path), when)
+    return [
+        {k: row[k] for k in FIELDS if k != 'kind'}
+        for _, row in sorted(state.items())
+    ]
+
+
+def diff_rows(date_iso: str, previous: State, current: t.Sequence[dict], keyframe: bool) -> list[dict]:
+    """Log rows that turn ``previous`` into ``current`` at ``date_iso``."""
+    out: list[dict] = []
+    seen: set[str] = set()
+    for r in current:
+        coin_type = str(r['coin_type'])
+        seen.add(coin_type)
+        row = {
+            'date_iso': date_iso,
+            'kind': 'K' if keyframe else 'D',
+            'coin_type': coin_type,
+            'symbol': r.get('symbol', ''),
+            'decimals': str(r.get('decimals', '')),
+            'raw_balance': str(r.get('raw_balance', '')),
+        }
+        prev = previous.get(coin_type)
+        if keyframe or prev is None or prev.get('raw_balance') != row['raw_balance']:
+            out.append(row)
+    if not keyframe:
+        for coin_type in sorted(set(previous) - seen):
+            out.append({
+                'date_iso': date_iso, 'kind': 'X', 'coin_type': coin_type,
+                'symbol': '', 'decimals': '', 'raw_balance': '',
+            })
+    return out
+
+
+def _needs_keyframe(date_iso: str, keyframe_date: str | None, keyframe_days: float) -> bool:
+    if keyframe_date is None:
+        return True
+    return _parse_iso(date_iso) - _parse_iso(keyframe_date) >= dt.timedelta(days=keyframe_days)
+
+
+def _write(path: Path, rows: list[dict]) -> None:
+    write_header = not path.exists()
+    with path.open('a', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        if write_header:
+            w.writeheader()
+        w.writerows(rows)
+
+
+def append_snapshot(path: Path, date_iso: str, rows: t.Sequence[dict], keyframe_days: float = KEYFRAME_DAYS) -> int:
+    """Append the delta between the logged state and ``rows``; return rows written."""
+    previous, keyframe_date = _replay(read_tail(path))
+    keyframe = _needs_keyframe(date_iso, keyframe_date, keyframe_days)
+    out = diff_rows(date_iso, previous, rows, keyframe)
+    if out:
+        _write(path, out)
+    return len(out)
+
+
+def convert(full_csv: Path, out_path: Path, keyframe_days: float = KEYFRAME_DAYS) -> tuple[int, int]:
+    """Convert a full ``portfolio_<prefix>.csv`` log; return ``(rows in, rows out)``."""
+    snapshots: dict[str, list[dict]] = {}
+    rows_in = 0
+    with full_csv.open(newline='') as f:
+        for r in csv.DictReader(f):
+            snapshots.setdefault(r['date_iso'], []).append(r)
+            rows_in += 1
+    state: State = {}
+    keyframe_date: str | None = None
+    out: list[dict] = []
+    for date_iso in sorted(snapshots):
+        keyframe = _needs_keyframe(date_iso, keyframe_date, keyframe_days)
+        rows = diff_rows(date_iso, state, snapshots[date_iso], keyframe)
+        state, keyframe_date = _replay(rows, state=state, keyframe_date=keyframe_date)
+        out.extend(rows)
+    if out_path.exists():
+        out_path.unlink()
+    _write(out_path, out)
+    return rows_in, len(out)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Delta-encoded balance log tools')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_conv = sub.add_parser('convert', help='Convert portfolio_<prefix>.csv into a delta log')
+    p_conv.add_argument('full_csv', type=Path)
+    p_conv.add_argument('--output', '-o', type=Path, help='default: balances_<prefix>.csv next to the input')
+    p_show = sub.add_parser('show', help='Print the balance set at a timestamp')
+    p_show.add_argument('log', type=Path)
+    p_show.add_argument('--at', help='ISO timestamp (default: latest)')
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'convert':
+        out = args.output or args.full_csv.with_name(args.full_csv.name.replace('portfolio_', 'balances_', 1))
+        rows_in, rows_out = convert(args.full_csv, out)
+        print(f'{args.full_csv}: {rows_in} rows -> {out}: {rows_out} rows')
+    else:
+        w = csv.DictWriter(sys.stdout, fieldnames=[k for k in FIELDS if k != 'kind'])
+        w.writeheader()
+        w.writerows(balances_at(args.log, args.at))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+"""Sources of "this address changed" events for the snapshot daemon.
+
+Instead of re-querying every address on a timer, ``portfolio_daemon.py
+--events`` asks an event source which of ``SUI_ADDRESSES`` were touched by
+new transactions and re-collects only those.  Two pollers are available
+(public fullnodes no longer serve websocket subscriptions, and the scripts
+stay stdlib-only):
+
+- ``checkpoints`` (``CheckpointTailer``): follows the checkpoint stream with
+  ``sui_getCheckpoints`` and reads the transactions of each new checkpoint
+  with ``sui_multiGetTransactionBlocks``; an address is affected when it sent
+  the transaction or appears as owner in its balance or object changes.  The
+  cost follows chain activity, not the number of watched addresses.
+- ``transactions`` (``TransactionHeadPoller``): the change detection of
+  incremental mode, i.e. the newest digest sent from / to each address, two
+  calls per address in one batch.  Cheaper for a handful of addresses.
+
+``RefreshQueue`` coalesces bursts: affected addresses accumulate until no new
+event arrived for ``SUI_EVENTS_COALESCE_SECONDS`` (default 2), or at most
+``SUI_EVENTS_MAX_DELAY_SECONDS`` (default 10) after the first one.
+
+``benchmarks/stub_servers.py`` serves the checkpoint feed and lets tests
+append transactions with ``POST /stub/emit``.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import typing as t
+
+import sui_daily_portfolio
+from sui_rpc import RPC_URL, rpc, rpc_batch
+
+SOURCE = os.environ.get('SUI_EVENTS', '')
+POLL_SECONDS = float(os.environ.get('SUI_EVENTS_POLL_SECONDS', 1))
+COALESCE_SECONDS = float(os.environ.get('SUI_EVENTS_COALESCE_SECONDS', 2))
+MAX_DELAY_SECONDS = float(os.environ.get('SUI_EVENTS_MAX_DELAY_SECONDS', 10))
+# Checkpoints to read per poll before giving up and flagging every address.
+MAX_LAG = int(os.environ.get('SUI_EVENTS_MAX_LAG', 1000))
+CHECKPOINT_PAGE_SIZE = 50
+# Largest digest list accepted by sui_multiGetTransactionBlocks.
+TX_CHUNK_SIZE = 50
+TX_OPTIONS = {'showInput': True, 'showBalanceChanges': True, 'showObjectChanges': True}
+
+
+class EventSource(t.Protocol):
+    def poll(self) -> set[str]:
+        """Addresses touched since the previous call (empty on the first call)."""
+        ...
+
+
+def normalize_address(address: str) -> str:
+    """Lower-case, zero-padded form used by the fullnode in responses."""
+    a = address.strip().lower()
+    a = a[2:] if a.startswith('0x') else a
+    return '0x' + a.rjust(64, '0')
+
+
+def _owner_address(owner: t.Any) -> str | None:
+    if isinstance(owner, dict):
+        return owner.get('AddressOwner')
+    return None
+
+
+def touched_addresses(tx: dict) -> set[str]:
+    """Sender plus every address owner in the balance and object changes of ``tx``."""
+    out = set()
+    sender = (((tx.get('transaction') or {}).get('data') or {}).get('sender'))
+    if sender:
+        out.add(sender)
+    for change in tx.get('balanceChanges') or []:
+        owner = _owner_address(change.get('owner'))
+        if owner:
+            out.add(owner)
+    for change in tx.get('objectChanges') or []:
+        for key in ('owner', 'recipient'):
+            owner = _owner_address(change.get(key))
+            if owner:
+                out.add(owner)
+    return {normalize_address(a) for a in out}
+
+
+class CheckpointTailer:
+    """Tail checkpoints and report which watched addresses new transactions touched.
+
+    The cursor only advances past checkpoints whose transactions were read,
+    so a failed poll is retried from the same place.  When more than
+    ``max_lag`` checkpoints are pending (e.g. after a long outage) the tailer
+    skips to the tip and reports every watched address instead.
+    """
+
+    def __init__(
+        self,
+        addresses: t.Iterable[str],
+        url: str = RPC_URL,
+        max_lag: int = MAX_LAG,
+        page_size: int = CHECKPOINT_PAGE_SIZE,
+    ) -> None:
+        self.watched = {normalize_address(a): a for a in addresses}
+        self.url = url
+        self.max_lag = max_lag
+        self.page_size = page_size
+        self.cursor: int | None = None
+        self.transactions = 0
+
+    def _affected(self, digests: list[str]) -> set[str]:
+        calls = [
+            ('sui_multiGetTransactionBlocks', [digests[i:i + TX_CHUNK_SIZE], TX_OPTIONS])
+            for i in range(0, len(digests), TX_CHUNK_SIZE)
+        ]
+        affected = set()
+        for txs in rpc_batch(calls, url=self.url) if calls else []:
+            for tx in txs or []:
+                affected |= touched_addresses(tx)
+        self.transactions += len(digests)
+        return {self.watched[a] for a in affected if a in self.watched}
+
+    def poll(self) -> set[str]:
+        latest = int(rpc('sui_getLatestCheckpointSequenceNumber', [], url=self.url))
+        if self.cursor is None:
+            self.cursor = latest
+            return set()
+        if latest - self.cursor > self.max_lag:
+            self.cursor = latest
+            return set(self.watched.values())
+        affected: set[str] = set()
+        while self.cursor < latest:
+            page = rpc('sui_getCheckpoints', [str(self.cursor), self.page_size, False], url=self.url) or {}
+            checkpoints = page.get('data') or []
+            if not checkpoints:
+                break
+            affected |= self._affected([d for cp in checkpoints for d in cp.get('transactions') or []])
+            self.cursor = int(checkpoints[-1]['sequenceNumber'])
+            if not page.get('hasNextPage'):
+                break
+        return affected
+
+
+class TransactionHeadPoller:
+    """Report addresses whose newest sent or received transaction changed."""
+
+    def __init__(self, addresses: t.Iterable[str], heads: t.Mapping[str, dict] | None = None) -> None:
+        self.addresses = list(addresses)
+        self.heads: dict[str, dict] = dict(heads or {})
+        self.primed = bool(self.heads)
+
+    def poll(self) -> set[str]:
+        current = sui_daily_portfolio.get_last_tx_many(self.addresses)
+        changed = {a for a, head in current.items() if self.heads.get(a) != head}
+        self.heads.update(current)
+        if not self.primed:
+            self.primed = True
+            return set()
+        return changed
+
+
+def make_source(kind: str, addresses: t.Iterable[str], heads: t.Mapping[str, dict] | None = None) -> EventSource:
+    if kind == 'checkpoints':
+        return CheckpointTailer(addresses)
+    if kind == 'transactions':
+        return TransactionHeadPoller(addresses, heads)
+    raise ValueError(f'unknown event source {kind!r} (expected checkpoints or transactions)')
+
+
+class RefreshQueue:
+    """Pending addresses, released once a burst of events has settled."""
+
+    def __init__(
+        self,
+        coalesce: float = COALESCE_SECONDS,
+        max_delay: float = MAX_DELAY_SECONDS,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.coalesce = coalesce
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending: set[str] = set()
+        self.first_at = 0.0
+        self.last_at = 0.0
+
+    def add(self, addresses: t.Iterable[str]) -> None:
+        addresses = set(addresses)
+        if not addresses:
+            return
+        now = self.clock()
+        if not self.pending:
+            self.first_at = now
+        self.pending |= addresses
+        self.last_at = now
+
+    def take(self) -> set[str]:
+        """The pending addresses if the burst is over (or too old), else nothing."""
+        if not self.pending:
+            return set()
+        now = self.clock()
+        if now - self.last_at < self.coalesce and now - self.first_at < self.max_delay:
+            return set()
+        batch, self.pending = self.pending, set()
+        return batch
+
+    def clear(self) -> None:
+        self.pending = set()
@@ -0,0 +1,111 @@
+"""Persistent on-disk cache for ``suix_getCoinMetadata`` lookups.
+
+Symbol and decimals for a coin type practically never change, so the
+collectors keep them in ``data/coin_metadata_cache.json`` (override with
+``COIN_METADATA_CACHE``) instead of asking the fullnode on every run.
+Entries expire after ``COIN_METADATA_TTL`` seconds (default one week).  Coin
+types for which the fullnode returned no metadata are cached as negative
+entries and retried after the shorter ``COIN_METADATA_NEGATIVE_TTL`` (default
+one day).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import time
+import typing as t
+
+OUT_DIR = pathlib.Path(os.environ.get('OUT_DIR', 'data'))
+CACHE_PATH = pathlib.Path(os.environ.get('COIN_METADATA_CACHE') or OUT_DIR / 'coin_metadata_cache.json')
+TTL_SECONDS = float(os.environ.get('COIN_METADATA_TTL', 7 * 24 * 3600))
+NEGATIVE_TTL_SECONDS = float(os.environ.get('COIN_METADATA_NEGATIVE_TTL', 24 * 3600))
+
+# Only the fields the collectors actually use are persisted.
+KEPT_FIELDS = ('symbol', 'decimals', 'name')
+
+Fetcher = t.Callable[[t.List[str]], t.Mapping[str, t.Optional[dict]]]
+
+
+class CoinMetadataCache:
+    """JSON-backed ``coin_type -> metadata`` map with TTL and negative caching."""
+
+    def __init__(
+        self,
+        path: str | pathlib.Path = CACHE_PATH,
+        ttl: float = TTL_SECONDS,
+        negative_ttl: float = NEGATIVE_TTL_SECONDS,
+        clock: t.Callable[[], float] = time.time,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.entries: dict[str, dict] = self._load()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            obj = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        entries = obj.get('entries') if isinstance(obj, dict) else None
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, coin_type: str) -> tuple[bool, dict | None]:
+        """Return ``(hit, metadata)``; ``metadata`` is ``None`` for negative hits."""
+        entry = self.entries.get(coin_type)
+        if not isinstance(entry, dict):
+            return False, None
+        meta = entry.get('metadata')
+        ttl = self.ttl if meta else self.negative_ttl
+        if self.clock() - float(entry.get('fetched_at') or 0) > ttl:
+            return False, None
+        return True, meta
+
+    def put(self, coin_type: str, meta: dict | None) -> None:
+        slim = {k: meta[k] for k in KEPT_FIELDS if k in meta} if meta else None
+        self.entries[coin_type] = {'fetched_at': int(self.clock()), 'metadata': slim}
+        self.dirty = True
+
+    def resolve(self, coin_types: t.Iterable[str], fetch: Fetcher) -> dict[str, dict | None]:
+        """Return metadata for ``coin_types``, calling ``fetch`` only for misses.
+
+        ``fetch`` receives the list of coin types that are missing or expired and
+        returns a mapping of coin type to metadata (``None`` when the fullnode has
+        none).  Coin types absent from that mapping are not cached, so transient
+        failures are retried next time.
+        """
+        out: dict[str, dict | None] = {}
+        missing: list[str] = []
+        for coin_type in dict.fromkeys(coin_types):
+            hit, meta = self.get(coin_type)
+            if hit:
+                self.hits += 1
+                out[coin_type] = meta
+            else:
+                missing.append(coin_type)
+        if missing:
+            self.misses += len(missing)
+            fetched = fetch(missing)
+            for coin_type in missing:
+                if coin_type in fetched:
+                    meta = fetched[coin_type] or None
+                    self.put(coin_type, meta)
+                    out[coin_type] = meta
+                else:
+                    out[coin_type] = None
+        return out
+
+    def save(self) -> None:
+        """Write the cache back to disk if anything changed."""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps({'version': 1, 'entries': self.entries}, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -0,0 +1,123 @@
+"""Downsampling of portfolio time series for the dashboards.
+
+Years of intraday snapshots are too many points to ship to a browser chart.
+Two reductions are offered, both over time-ordered rows (dicts with an ISO
+``date_iso`` and numeric series):
+
+- ``minmax``: per time bucket, keep the first, lowest, highest and last row
+  of a key series.  Used for the fixed resolutions in ``RESOLUTIONS``
+  (hourly, daily, weekly), which ``history_store`` precomputes; spikes and
+  dips survive at every resolution.
+- ``lttb``: Largest-Triangle-Three-Buckets, reduces any series to a target
+  number of points while keeping its visual shape.  Used as the last step
+  when even the coarsest resolution has more than ``CHART_MAX_POINTS`` rows.
+
+The module only uses the standard library so it can be shared by ``app.py``
+(via ``history_store``) and ``scripts/portfolio_dashboard.py``.
+"""
+
+from __future__ import annotations
+
+import calendar
+import datetime as dt
+import os
+import typing as t
+
+Row = t.Dict[str, t.Any]
+
+# Bucket width in seconds per resolution; ``raw`` keeps every row.
+RESOLUTIONS: dict[str, int | None] = {
+    'raw': None,
+    'hourly': 3600,
+    'daily': 86400,
+    'weekly': 7 * 86400,
+}
+MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 1000))
+# 1970-01-01 was a Thursday; shift weekly buckets so they start on Mondays.
+_WEEK_OFFSET = 3 * 86400
+
+
+def epoch(date_iso: str) -> float:
+    """Unix time of an ISO-8601 UTC timestamp such as ``2025-01-02T03:04:05Z``."""
+    parsed = dt.datetime.fromisoformat(date_iso.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    return calendar.timegm(parsed.utctimetuple()) + parsed.microsecond / 1e6
+
+
+def bucket_floor(ts: float, seconds: int) -> int:
+    """Start of the bucket containing ``ts`` (weekly buckets start on Monday 00:00 UTC)."""
+    offset = _WEEK_OFFSET if seconds % (7 * 86400) == 0 else 0
+    return int((ts + offset) // seconds * seconds - offset)
+
+
+def iso(ts: float) -> str:
+    return dt.datetime.fromtimestamp(ts, dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _value(row: Row, key: str) -> float | None:
+    value = row.get(key)
+    return None if value is None else float(value)
+
+
+def minmax(rows: t.Sequence[Row], seconds: int, key: str, time_key: str = 'date_iso') -> list[Row]:
+    """First, min, max and last row of ``key`` per ``seconds``-wide bucket, in time order."""
+    out: list[Row] = []
+    bucket: list[Row] = []
+    current: int | None = None
+
+    def flush() -> None:
+        valued = [r for r in bucket if _value(r, key) is not None]
+        picks = {id(bucket[0]): bucket[0], id(bucket[-1]): bucket[-1]}
+        if valued:
+            low = min(valued, key=lambda r: _value(r, key))
+            high = max(valued, key=lambda r: _value(r, key))
+            picks[id(low)] = low
+            picks[id(high)] = high
+        out.extend(r for r in bucket if id(r) in picks)
+
+    for row in rows:
+        b = bucket_floor(epoch(row[time_key]), seconds)
+        if b != current and bucket:
+            flush()
+            bucket = []
+        current = b
+        bucket.append(row)
+    if bucket:
+        flush()
+    return out
+
+
+def lttb(rows: t.Sequence[Row], threshold: int, key: str, time_key: str = 'date_iso') -> list[Row]:
+    """Reduce ``rows`` to ``threshold`` points with Largest-Triangle-Three-Buckets on ``key``.
+
+    The first and last rows are always kept.  Rows whose ``key`` is missing
+    count as zero when choosing points.
+    """
+    n = len(rows)
+    if threshold >= n or threshold < 3:
+        return list(rows)
+    xs = [epoch(r[time_key]) for r in rows]
+    ys = [_value(r, key) or 0.0 for r in rows]
+    every = (n - 2) / (threshold - 2)
+    out = [rows[0]]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex.
+        nxt_start = int((i + 1) * every) + 1
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        span = max(1, nxt_end - nxt_start)
+        avg_x = sum(xs[nxt_start:nxt_end]) / span
+        avg_y = sum(ys[nxt_start:nxt_end]) / span
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(rows[best])
+        a = best
+    out.append(rows[-1])
+    return out
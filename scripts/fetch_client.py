@@ -0,0 +1,287 @@
+"""Shared HTTP client used by every fetch script.
+
+All outbound requests (Sui JSON-RPC via ``sui_rpc``, CoinGecko, Blockvision and
+the protocol APIs) go through ``request``/``get_json``/``post_json`` here, so
+transport behaviour is defined once:
+
+- keep-alive pooling from ``http_pool`` (and record/replay from ``http_archive``);
+- retries of transient failures (connection errors, HTTP 429 and 5xx) with
+  jittered exponential backoff, ``FETCH_RETRIES`` attempts (default 3) starting
+  at ``FETCH_BACKOFF`` seconds (default 0.5);
+- ``Retry-After`` on a 429/5xx pauses every request to that host for the
+  given time instead of the backoff; a server asking for more than
+  ``FETCH_MAX_RETRY_AFTER`` seconds (default 60) fails the request;
+- at most ``FETCH_MAX_PER_HOST`` requests in flight per host (default
+  ``HTTP_POOL_SIZE``), whatever the number of worker threads;
+- conditional GETs (``get_json_conditional``) from stored ``ETag`` /
+  ``Last-Modified`` validators;
+- per-host and per-JSON-RPC-method metrics (counts, errors, retries and a
+  latency histogram) in ``METRICS``, printed by ``report_stats`` and written
+  to ``data/run_metrics.json`` by ``run_metrics``.
+
+Errors keep the ``urllib`` types: ``HTTPError`` for status codes >= 400 and
+``URLError`` for connection failures, raised after the last attempt.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import json
+import os
+import random
+import sys
+import threading
+import time
+import typing as t
+import urllib.parse
+from urllib.error import HTTPError, URLError
+
+import http_archive
+import http_pool
+
+RETRIES = int(os.environ.get('FETCH_RETRIES', 3))
+BACKOFF = float(os.environ.get('FETCH_BACKOFF', 0.5))
+MAX_BACKOFF = 30.0
+MAX_RETRY_AFTER = float(os.environ.get('FETCH_MAX_RETRY_AFTER', 60))
+MAX_PER_HOST = int(os.environ.get('FETCH_MAX_PER_HOST', http_pool.POOL_SIZE))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+USER_AGENT = 'sui-portfolio-bot/1.0 (+github-actions)'
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf bucket is implied.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF, cap: float = MAX_BACKOFF) -> float:
+    """Delay before retry number ``attempt + 1``: half fixed, half random.
+
+    The jitter keeps parallel workers that failed together from retrying in
+    lock-step against the same host.
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def sleep_backoff(attempt: int, base: float = BACKOFF) -> None:
+    if not http_archive.replaying():
+        time.sleep(backoff_delay(attempt, base))
+
+
+def retry_after(headers: t.Any) -> float | None:
+    """Seconds to wait from a ``Retry-After`` header (delay or HTTP date), if any."""
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _new_stat() -> dict[str, t.Any]:
+    return {
+        'requests': 0,
+        'errors': 0,
+        'retries': 0,
+        'seconds': 0.0,
+        'max_seconds': 0.0,
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def _observe(stat: dict[str, t.Any], seconds: float) -> None:
+    stat['seconds'] += seconds
+    stat['max_seconds'] = max(stat['max_seconds'], seconds)
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            stat['buckets'][i] += 1
+            return
+    stat['buckets'][-1] += 1
+
+
+class FetchMetrics:
+    """Thread-safe request metrics keyed by HTTP host and by JSON-RPC method.
+
+    Each entry counts requests (for methods: calls), errors and retries, and
+    keeps a latency histogram over ``LATENCY_BUCKETS``.  A JSON-RPC batch adds
+    one latency observation per distinct method it carried.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.hosts: dict[str, dict[str, t.Any]] = {}
+        self.methods: dict[str, dict[str, t.Any]] = {}
+
+    def record(self, host: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            h = self.hosts.setdefault(host, _new_stat())
+            h['requests'] += 1
+            h['errors'] += 0 if ok else 1
+            _observe(h, seconds)
+
+    def retry(self, host: str) -> None:
+        with self.lock:
+            self.hosts.setdefault(host, _new_stat())['retries'] += 1
+
+    def record_rpc(self, method: str, seconds: float, calls: int, errors: int) -> None:
+        with self.lock:
+            m = self.methods.setdefault(method, _new_stat())
+            m['requests'] += calls
+            m['errors'] += errors
+            _observe(m, seconds)
+
+    def retry_rpc(self, method: str, calls: int = 1) -> None:
+        with self.lock:
+            self.methods.setdefault(method, _new_stat())['retries'] += calls
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, t.Any]]]:
+        """``{'hosts': {host: stat}, 'rpc_methods': {method: stat}}`` (deep copies)."""
+        with self.lock:
+            return {
+                'hosts': {k: {**v, 'buckets': list(v['buckets'])} for k, v in self.hosts.items()},
+                'rpc_methods': {k: {**v, 'buckets': list(v['buckets'])} for k, v in self.methods.items()},
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.hosts.clear()
+            self.methods.clear()
+
+
+METRICS = FetchMetrics()
+
+_HOST_SLOTS: dict[str, threading.BoundedSemaphore] = {}
+_HOST_SLOTS_LOCK = threading.Lock()
+# Monotonic time before which no request may be sent to a host (Retry-After).
+_HOST_PAUSED_UNTIL: dict[str, float] = {}
+
+
+def _host_slot(host: str) -> threading.BoundedSemaphore:
+    with _HOST_SLOTS_LOCK:
+        slot = _HOST_SLOTS.get(host)
+        if slot is None:
+            slot = _HOST_SLOTS[host] = threading.BoundedSemaphore(max(1, MAX_PER_HOST))
+        return slot
+
+
+def pause_host(host: str, seconds: float) -> None:
+    """Hold back every request to ``host`` for ``seconds``."""
+    with _HOST_SLOTS_LOCK:
+        until = time.monotonic() + seconds
+        _HOST_PAUSED_UNTIL[host] = max(until, _HOST_PAUSED_UNTIL.get(host, 0.0))
+
+
+def _wait_for_host(host: str) -> None:
+    with _HOST_SLOTS_LOCK:
+        until = _HOST_PAUSED_UNTIL.get(host, 0.0)
+    delay = until - time.monotonic()
+    if delay > 0 and not http_archive.replaying():
+        time.sleep(delay)
+
+
+def request(
+    method: str,
+    url: str,
+    body: bytes | None = None,
+    headers: t.Mapping[str, str] | None = None,
+    timeout: float | None = None,
+    retries: int = RETRIES,
+    backoff: float = BACKOFF,
+) -> http_pool.PooledResponse:
+    """Send one request, retrying transient failures up to ``retries`` attempts in total."""
+    host = urllib.parse.urlsplit(url).hostname or ''
+    delay: float | None = None
+    for attempt in range(max(1, retries)):
+        if attempt:
+            METRICS.retry(host)
+            if delay is None:
+                sleep_backoff(attempt - 1, backoff)
+        _wait_for_host(host)
+        start = time.perf_counter()
+        try:
+            with _host_slot(host):
+                resp = http_pool.POOL.request(method, url, body, headers, timeout)
+        except HTTPError as e:
+            METRICS.record(host, time.perf_counter() - start, ok=False)
+            delay = retry_after(e.headers) if e.code in RETRY_STATUSES else None
+            if delay is not None:
+                pause_host(host, min(delay, MAX_RETRY_AFTER))
+            if e.code not in RETRY_STATUSES or attempt >= retries - 1 or (delay or 0) > MAX_RETRY_AFTER:
+                raise
+        except URLError:
+            METRICS.record(host, time.perf_counter() - start, ok=False)
+            delay = None
+            if attempt >= retries - 1:
+                raise
+        else:
+            METRICS.record(host, time.perf_counter() - start, ok=True)
+            return resp
+    raise URLError(f'no attempts made for {url}')  # pragma: no cover - loop always returns or raises
+
+
+def get_json(
+    url: str,
+    headers: t.Mapping[str, str] | None = None,
+    timeout: float | None = None,
+    retries: int = RETRIES,
+) -> t.Any:
+    """GET ``url`` and decode the JSON body."""
+    hdrs = {'Accept': 'application/json', 'User-Agent': USER_AGENT, **(headers or {})}
+    with request('GET', url, headers=hdrs, timeout=timeout, retries=retries) as r:
+        return json.loads(r.read().decode('utf-8'))
+
+
+def get_json_conditional(
+    url: str,
+    validators: t.Mapping[str, str] | None = None,
+    headers: t.Mapping[str, str] | None = None,
+    timeout: float | None = None,
+    retries: int = RETRIES,
+) -> tuple[t.Any, dict[str, str]]:
+    """GET ``url`` unless it is unchanged since ``validators`` were recorded.
+
+    ``validators`` holds the ``etag`` and/or ``last_modified`` of an earlier
+    response.  Returns ``(None, validators)`` when the server answers
+    ``304 Not Modified``, otherwise the decoded body with the validators of
+    the new response (empty when the server sends none).
+    """
+    validators = dict(validators or {})
+    hdrs = {'Accept': 'application/json', 'User-Agent': USER_AGENT, **(headers or {})}
+    if validators.get('etag'):
+        hdrs['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        hdrs['If-Modified-Since'] = validators['last_modified']
+    with request('GET', url, headers=hdrs, timeout=timeout, retries=retries) as r:
+        if r.status == 304:
+            return None, validators
+        fresh = {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+        return json.loads(r.read().decode('utf-8')), {k: v for k, v in fresh.items() if v}
+
+
+def post_json(
+    url: str,
+    obj: t.Any,
+    headers: t.Mapping[str, str] | None = None,
+    timeout: float | None = None,
+    retries: int = RETRIES,
+) -> t.Any:
+    """POST ``obj`` as JSON to ``url`` and decode the JSON response."""
+    hdrs = {'Content-Type': 'application/json', 'User-Agent': USER_AGENT, **(headers or {})}
+    data = json.dumps(obj).encode('utf-8')
+    with request('POST', url, body=data, headers=hdrs, timeout=timeout, retries=retries) as r:
+        return json.loads(r.read().decode('utf-8'))
+
+
+def report_stats(stream: t.TextIO = sys.stderr) -> None:
+    """Print connection reuse and request metrics, one line per host."""
+    http_pool.report_stats(stream)
+    for host, m in sorted(METRICS.snapshot()['hosts'].items()):
+        mean_ms = 1000 * m['seconds'] / m['requests'] if m['requests'] else 0.0
+        print(
+            f"fetch {host}: {int(m['requests'])} requests, {int(m['errors'])} errors, "
+            f"{int(m['retries'])} retries, mean {mean_ms:.0f} ms, max {1000 * m['max_seconds']:.0f} ms",
+            file=stream,
+        )
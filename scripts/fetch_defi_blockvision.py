@@ -1,36 +1,41 @@
 ""
 from __future__ import annotations
-import json
 import os
 import pathlib
 import time
 import urllib.parse
-import urllib.request
 from urllib.error import HTTPError, URLError
 
+import fetch_client
+import http_archive
+from payload_cache import PayloadCache
+
 OUT_DIR = pathlib.Path(os.environ.get('OUT_DIR', 'data'))
 API_KEY = os.environ.get('BLOCKVISION_API_KEY') or ''
 ADDRS_ENV = os.environ.get('SUI_ADDRESSES') or os.environ.get('SUI_ADDRESS') or ''
 ADDRESSES = [a.strip() for a in ADDRS_ENV.split(',') if a.strip()]
 
-BASE = 'https://api.blockvision.org/v2/sui/account/defiPortfolio'
+BASE = os.environ.get('BLOCKVISION_URL', 'https://api.blockvision.org') + '/v2/sui/account/defiPortfolio'
 UA = 'sui-portfolio-bot/1.0 (+github-actions)'
+# ETag/Last-Modified per URL and skip-if-identical writes, see payload_cache.
+PAYLOADS = PayloadCache(OUT_DIR / 'http_validators.json')
 
 
-def fetch(addr: str) -> dict:
+def fetch(addr: str, target: pathlib.Path | None = None) -> dict | None:
+    """DeFi portfolio of ``addr``; with ``target``, ``None`` if that file is still current."""
     qs = urllib.parse.urlencode({'address': addr})
     url = f'{BASE}?{qs}'
-    headers = {'Accept': 'application/json', 'User-Agent': UA}
+    headers = {'User-Agent': UA}
     if API_KEY:
         headers['X-API-Key'] = API_KEY
-    req = urllib.request.Request(url, headers=headers, method='GET')
-    with urllib.request.urlopen(req, timeout=30) as r:
-        return json.loads(r.read().decode('utf-8'))
+    if target is None:
+        return fetch_client.get_json(url, headers=headers, timeout=30)
+    return PAYLOADS.fetch_json(url, target, headers=headers, timeout=30)
 
 
-def write_json(path: pathlib.Path, obj: dict) -> None:
+def write_json(path: pathlib.Path, obj: dict) -> bool:
     OUT_DIR.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, indent=2))
+    return PAYLOADS.write_json(path, obj)
 
 
 def main() -> None:
@@ -45,8 +50,10 @@ def main() -> None:
     for addr in ADDRESSES:
         pref = addr[:10]
         try:
-            data = fetch(addr)
-            write_json(OUT_DIR / f'defi_bv_{pref}.json', data)
+            target = OUT_DIR / f'defi_bv_{pref}.json'
+            data = fetch(addr, target)
+            if data is not None:
+                write_json(target, data)
         except HTTPError as e:
             body = ''
             try:
@@ -68,7 +75,12 @@ def main() -> None:
                 'error': 'Exception',
                 'reason': str(e),
             })
-        time.sleep(0.25)
+        if not http_archive.replaying():
+            time.sleep(0.25)
+
+    PAYLOADS.save()
+    PAYLOADS.report('blockvision')
+    fetch_client.report_stats()
 
 
 if __name__ == '__main__':
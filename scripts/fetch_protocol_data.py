@@ -5,18 +5,30 @@ public API.  Addresses are read from the environment variable
 ``SUI_ADDRESSES`` (comma-separated) or ``SUI_ADDRESS``.  Results are stored as
 JSON files in the ``data`` directory.  Any errors are written to ``*_error.json``
 files so downstream tooling can surface failures gracefully.
+
+Requests run in parallel across protocol hosts.  Each host gets its own
+budget instead of a global pause between calls: at most
+``PROTOCOL_MAX_PER_HOST`` requests in flight (default 2) and
+``PROTOCOL_RATE`` requests per second (default 4, bursts of
+``PROTOCOL_BURST``).  Throttling responses with ``Retry-After`` pause that
+host only (see ``fetch_client``).
+
+Unchanged payloads are not rewritten: requests are conditional on the last
+``ETag``/``Last-Modified`` and identical JSON is skipped (``payload_cache``).
 """
 
 from __future__ import annotations
 
-import json
+import concurrent.futures
 import os
 import pathlib
-import time
-from typing import Callable, Dict
+import urllib.parse
+from typing import Callable, Dict, List, Tuple
 
-import urllib.request
-import urllib.error
+import fetch_client
+import http_archive
+from payload_cache import PayloadCache
+from rate_limit import TokenBucket
 
 # ------------------------------------------------------------
 # Configuration
@@ -25,6 +37,10 @@ OUT_DIR = pathlib.Path(os.environ.get("OUT_DIR", "data"))
 ADDRS_ENV = os.environ.get("SUI_ADDRESSES") or os.environ.get("SUI_ADDRESS") or ""
 ADDRESSES = [a.strip() for a in ADDRS_ENV.split(",") if a.strip()]
 UA = "sui-portfolio-bot/1.0 (+github-actions)"
+MAX_PER_HOST = int(os.environ.get("PROTOCOL_MAX_PER_HOST", 2))
+RATE = float(os.environ.get("PROTOCOL_RATE", 4))
+BURST = float(os.environ.get("PROTOCOL_BURST", RATE))
+PAYLOADS = PayloadCache(OUT_DIR / "http_validators.json")
 
 # Endpoints for each protocol.  These URLs are based on publicly documented
 # APIs.  If an API changes, adjust the URL builders below.
@@ -38,20 +54,38 @@ PROTOCOL_ENDPOINTS: Dict[str, Callable[[str], str]] = {
 # ------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------
-def fetch_json(url: str) -> dict:
-    """Fetch JSON data from ``url`` using a common User-Agent."""
-    req = urllib.request.Request(
-        url,
-        headers={"Accept": "application/json", "User-Agent": UA},
-        method="GET",
-    )
-    with urllib.request.urlopen(req, timeout=30) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-
-def write_json(path: pathlib.Path, obj: dict) -> None:
+def fetch_json(url: str, target: pathlib.Path | None = None) -> dict | None:
+    """Fetch JSON data from ``url`` through the shared client (pooled, retried).
+
+    With ``target``, the request is conditional and ``None`` means the copy
+    already in ``target`` is current.
+    """
+    if target is None:
+        return fetch_client.get_json(url, headers={"User-Agent": UA}, timeout=30)
+    return PAYLOADS.fetch_json(url, target, headers={"User-Agent": UA}, timeout=30)
+
+
+def write_json(path: pathlib.Path, obj: dict) -> bool:
+    """Write ``obj`` unless ``path`` already holds the same JSON; return whether it was written."""
     OUT_DIR.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, indent=2))
+    return PAYLOADS.write_json(path, obj)
+
+
+def fetch_to_file(proto: str, addr: str, url: str, limiter: TokenBucket | None = None) -> None:
+    """Fetch one protocol payload into ``{proto}_{prefix}.json`` (or ``_error.json``)."""
+    pref = addr[:10]
+    try:
+        if limiter is not None and not http_archive.replaying():
+            limiter.acquire()
+        target = OUT_DIR / f"{proto}_{pref}.json"
+        data = fetch_json(url, target)
+        if data is not None:
+            write_json(target, data)
+    except Exception as e:  # noqa: BLE001 - broad to capture network errors
+        write_json(
+            OUT_DIR / f"{proto}_{pref}_error.json",
+            {"error": str(e), "url": url},
+        )
 
 
 # ------------------------------------------------------------
@@ -64,19 +98,29 @@ def main() -> None:
         write_json(OUT_DIR / "protocols_error.json", {"error": "no addresses"})
         return
 
+    # One worker pool and token bucket per host, so a slow or throttling
+    # API never holds up the others.
+    by_host: Dict[str, List[Tuple[str, str, str]]] = {}
     for addr in ADDRESSES:
-        pref = addr[:10]
         for proto, url_fn in PROTOCOL_ENDPOINTS.items():
             url = url_fn(addr)
-            try:
-                data = fetch_json(url)
-                write_json(OUT_DIR / f"{proto}_{pref}.json", data)
-            except Exception as e:  # noqa: BLE001 - broad to capture network errors
-                write_json(
-                    OUT_DIR / f"{proto}_{pref}_error.json",
-                    {"error": str(e), "url": url},
-                )
-            time.sleep(0.25)  # be nice to public APIs
+            by_host.setdefault(urllib.parse.urlsplit(url).hostname or "", []).append((proto, addr, url))
+
+    pools: Dict[str, concurrent.futures.ThreadPoolExecutor] = {}
+    futures = []
+    try:
+        for host, jobs in by_host.items():
+            pool = pools[host] = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, MAX_PER_HOST))
+            limiter = TokenBucket(RATE, BURST)
+            futures += [pool.submit(fetch_to_file, proto, addr, url, limiter) for proto, addr, url in jobs]
+        concurrent.futures.wait(futures)
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+        PAYLOADS.save()
+
+    PAYLOADS.report("protocols")
+    fetch_client.report_stats()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
-import requests
-import json
+import functools
+
+from coin_metadata_cache import CoinMetadataCache
+from sui_rpc import RpcError, fetch_coin_metadata, rpc
 
 # =======================================================
 # Configuration
@@ -12,38 +14,17 @@ SUI_ADDRESS = '0xa63ef51b8abf601fb40d8514050a8d5613c0509d4b36323dc4439ee6c69d704
 # =======================================================
 def rpc_call(method: str, params: list):
     """
-    Makes a JSON-RPC call to the Sui full node.
+    Makes a JSON-RPC call to the Sui full node through the shared client
+    (pooled connections, retries with jittered backoff, 30 s timeout).
     """
-    payload = {
-        'jsonrpc': '2.0',
-        'id': 1,
-        'method': method,
-        'params': params,
-    }
-
-    headers = {
-        'Content-Type': 'application/json',
-    }
-
     try:
-        response = requests.post(SUI_RPC_URL, data=json.dumps(payload), headers=headers)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-
-        data = response.json()
-        if 'error' in data:
-            # For suix_getCoinMetadata, 'error' is sometimes returned when no metadata is found.
-            # We return None instead of raising an error to handle this case gracefully.
-            if method == 'suix_getCoinMetadata':
-                return None
-            else:
-                raise RuntimeError(f"RPC error: {data['error']['message']}")
-
-        return data['result']
-
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"HTTP request error: {e}")
-    except json.JSONDecodeError:
-        raise RuntimeError("Failed to parse JSON response from RPC")
+        return rpc(method, params, url=SUI_RPC_URL)
+    except RpcError:
+        # For suix_getCoinMetadata, 'error' is sometimes returned when no metadata is found.
+        # We return None instead of raising an error to handle this case gracefully.
+        if method == 'suix_getCoinMetadata':
+            return None
+        raise
 
 def get_all_balances(address: str):
     """
@@ -75,12 +56,18 @@ def main():
         print(f"{'Symbol':<10} {'Balance (Human)':<20} {'Coin Type'}")
         print("-" * 60)
 
+        # Step 3: Get coin metadata for a user-friendly view (cached on disk)
+        meta_cache = CoinMetadataCache()
+        metas = meta_cache.resolve(
+            [b.get('coinType') for b in balances],
+            functools.partial(fetch_coin_metadata, url=SUI_RPC_URL),
+        )
+        meta_cache.save()
+
         for b in balances:
             coin_type = b.get('coinType')
             raw_balance = int(b.get('totalBalance', '0'))
-            
-            # Step 3: Get coin metadata for a user-friendly view
-            meta = get_coin_metadata(coin_type)
+            meta = metas.get(coin_type)
             
             # Fix: Check if meta is None before trying to access its keys
             if meta:
@@ -100,6 +87,4 @@ def main():
         print(f"An error occurred: {e}")
 
 if __name__ == '__main__':
-    # You need to have the `requests` library installed. 
-    # If not, run: pip install requests
     main()
@@ -0,0 +1,420 @@
+"""SQLite-backed history store with a small query API.
+
+The CSV files in ``data/`` stay the committed source of truth; this module
+mirrors them into ``data/history.sqlite`` (override with ``HISTORY_DB``) so
+consumers can ask for a date range, an address or a coin type without parsing
+every row.  The database is a local cache and is not committed.
+
+Four tables are kept, each keyed and indexed the same way as its CSV:
+
+- ``totals``   <- ``history_totals.csv``   (``date_iso``)
+- ``assets``   <- ``history_assets.csv``   (``date_iso, address, coin_type``)
+- ``balances`` <- ``portfolio_<prefix>.csv`` (``date_iso, address, coin_type``)
+- ``prices``   <- ``price_history.csv``    (``date_iso, cg_id``)
+
+With ``BALANCE_LOG=delta`` the balances come from ``balances_<prefix>.csv``
+instead (see ``balance_log``): each snapshot in the log is expanded into the
+full balance set (the previous set plus that snapshot's ``K``/``D``/``X``
+rows), the same rows ``portfolio_<prefix>.csv`` holds for that run.  Runs that
+changed nothing for an address and wrote no keyframe have no rows; its
+balances at such a time are those of its latest earlier snapshot.
+
+``sync()`` imports only the bytes appended to each CSV since the previous
+sync, so the first call migrates everything and later calls are cheap.  Run
+``python scripts/history_store.py`` to do the one-time migration by hand.
+
+``sync()`` also keeps ``totals_rollup`` current: the totals downsampled to the
+hourly, daily and weekly resolutions of ``downsample.RESOLUTIONS`` (min/max
+buckets on ``portfolio_total``).  Only the buckets from the last rolled-up
+one onward are recomputed, as the CSV is appended in time order.
+``chart_totals`` picks the finest resolution that fits a point budget.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import sqlite3
+import typing as t
+from pathlib import Path
+
+try:
+    import balance_log
+    import downsample
+except ImportError:  # imported as ``scripts.history_store`` (app.py)
+    from scripts import balance_log, downsample
+
+DATA_DIR = Path(os.environ.get("OUT_DIR", "data"))
+DB_PATH = Path(os.environ.get("HISTORY_DB") or DATA_DIR / "history.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS totals (
+    date_iso TEXT PRIMARY KEY,
+    wallet_sum REAL,
+    suilend_net REAL,
+    portfolio_total REAL
+);
+CREATE TABLE IF NOT EXISTS assets (
+    date_iso TEXT NOT NULL,
+    address TEXT NOT NULL,
+    symbol TEXT,
+    coin_type TEXT NOT NULL,
+    human_balance REAL,
+    usd_value REAL,
+    PRIMARY KEY (date_iso, address, coin_type)
+);
+CREATE INDEX IF NOT EXISTS assets_address ON assets (address, date_iso);
+CREATE INDEX IF NOT EXISTS assets_coin ON assets (coin_type, date_iso);
+CREATE TABLE IF NOT EXISTS balances (
+    date_iso TEXT NOT NULL,
+    address TEXT NOT NULL,
+    coin_type TEXT NOT NULL,
+    symbol TEXT,
+    decimals INTEGER,
+    raw_balance TEXT,
+    human_balance REAL,
+    PRIMARY KEY (date_iso, address, coin_type)
+);
+CREATE INDEX IF NOT EXISTS balances_address ON balances (address, date_iso);
+CREATE INDEX IF NOT EXISTS balances_coin ON balances (coin_type, date_iso);
+CREATE TABLE IF NOT EXISTS prices (
+    date_iso TEXT NOT NULL,
+    cg_id TEXT NOT NULL,
+    usd REAL,
+    PRIMARY KEY (cg_id, date_iso)
+);
+CREATE TABLE IF NOT EXISTS totals_rollup (
+    resolution TEXT NOT NULL,
+    date_iso TEXT NOT NULL,
+    wallet_sum REAL,
+    suilend_net REAL,
+    portfolio_total REAL,
+    PRIMARY KEY (resolution, date_iso)
+);
+CREATE TABLE IF NOT EXISTS csv_imports (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+
+COLUMNS: dict[str, list[str]] = {
+    "totals": ["date_iso", "wallet_sum", "suilend_net", "portfolio_total"],
+    "assets": ["date_iso", "address", "symbol", "coin_type", "human_balance", "usd_value"],
+    "balances": ["date_iso", "address", "coin_type", "symbol", "decimals", "raw_balance", "human_balance"],
+    "prices": ["date_iso", "cg_id", "usd"],
+}
+NUMERIC = {"wallet_sum", "suilend_net", "portfolio_total", "human_balance", "usd_value", "decimals", "usd"}
+
+Row = t.Dict[str, t.Any]
+
+
+def _num(value: t.Any) -> t.Any:
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    """Thin wrapper around the history database."""
+
+    def __init__(self, path: str | Path = DB_PATH, data_dir: str | Path = DATA_DIR) -> None:
+        self.path = Path(path)
+        self.data_dir = Path(data_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # -- writing --
+
+    def insert(self, table: str, rows: t.Iterable[t.Mapping[str, t.Any]]) -> int:
+        """Insert ``rows`` into ``table``, ignoring keys that already exist."""
+        cols = COLUMNS[table]
+        values = [
+            tuple(_num(r.get(c)) if c in NUMERIC else r.get(c) for c in cols)
+            for r in rows
+        ]
+        sql = f"INSERT OR IGNORE INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        with self.conn:
+            cur = self.conn.executemany(sql, values)
+        return max(cur.rowcount, 0)
+
+    def _new_rows(self, path: Path) -> tuple[t.Iterator[dict], int] | None:
+        """Rows appended to ``path`` since the last import, and the offset after them."""
+        if not path.exists():
+            return None
+        key = str(path.resolve())
+        found = self.conn.execute("SELECT offset FROM csv_imports WHERE path = ?", (key,)).fetchone()
+        offset = found["offset"] if found else 0
+        size = path.stat().st_size
+        if size < offset:  # file was rewritten; start over
+            offset = 0
+        if size == offset:
+            return None
+        with path.open("rb") as f:
+            header = f.readline()
+            start = max(offset, len(header))
+            f.seek(start)
+            tail = f.read()
+        # Leave a partially written last line for the next sync.
+        tail = tail[: tail.rfind(b"\n") + 1]
+        fieldnames = next(csv.reader([header.decode("utf-8")]), [])
+        return csv.DictReader(io.StringIO(tail.decode("utf-8")), fieldnames=fieldnames), start + len(tail)
+
+    def _mark_imported(self, path: Path, offset: int) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO csv_imports (path, offset) VALUES (?, ?)",
+                (str(path.resolve()), offset),
+            )
+
+    def import_csv(self, table: str, path: Path) -> int:
+        """Import rows appended to ``path`` since the last import."""
+        new = self._new_rows(path)
+        if new is None:
+            return 0
+        rows, offset = new
+        count = self.insert(table, rows)
+        self._mark_imported(path, offset)
+        return count
+
+    def _full_address(self, prefix: str) -> str:
+        """Address of a ``balances_<prefix>.csv`` log, whose rows do not carry it."""
+        found = self.conn.execute(
+            "SELECT address FROM assets WHERE address LIKE ? LIMIT 1", (prefix + "%",)
+        ).fetchone()
+        if found:
+            return found["address"]
+        try:
+            accounts = json.loads((self.data_dir / "latest.json").read_text()).get("accounts") or []
+        except (OSError, ValueError):
+            accounts = []
+        for account in accounts:
+            if str(account.get("address", "")).startswith(prefix):
+                return account["address"]
+        print(f"history_store: no full address for {prefix}, storing the prefix", file=sys.stderr)
+        return prefix
+
+    def import_balance_log(self, path: Path) -> int:
+        """Import the snapshots appended to a delta log since the last import."""
+        new = self._new_rows(path)
+        if new is None:
+            return 0
+        rows, offset = new
+        address = self._full_address(path.stem[len("balances_"):])
+        # Start from the last snapshot already imported for this address.
+        last = self.conn.execute(
+            "SELECT MAX(date_iso) FROM balances WHERE address = ?", (address,)
+        ).fetchone()[0]
+        state: balance_log.State = {
+            r["coin_type"]: dict(r)
+            for r in self.conn.execute(
+                "SELECT coin_type, symbol, decimals, raw_balance FROM balances WHERE address = ? AND date_iso = ?",
+                (address, last),
+            )
+        }
+        keyframe_date = last
+        snapshots: list[Row] = []
+        for date_iso, changes in itertools.groupby(rows, key=lambda r: r["date_iso"]):
+            state, keyframe_date = balance_log._replay(changes, state=state, keyframe_date=keyframe_date)
+            for coin_type, r in sorted(state.items()):
+                decimals = int(float(r.get("decimals") or 0))
+                raw = r.get("raw_balance") or "0"
+                snapshots.append({
+                    "date_iso": date_iso,
+                    "address": address,
+                    "coin_type": coin_type,
+                    "symbol": r.get("symbol"),
+                    "decimals": decimals,
+                    "raw_balance": raw,
+                    # Rounded like the full log's ``human_balance`` column.
+                    "human_balance": float(f"{int(raw) / 10 ** decimals:.8f}"),
+                })
+        count = self.insert("balances", snapshots)
+        self._mark_imported(path, offset)
+        return count
+
+    def sync(self) -> dict[str, int]:
+        """Bring the database up to date with the CSVs in ``data_dir``."""
+        counts = {
+            "totals": self.import_csv("totals", self.data_dir / "history_totals.csv"),
+            "assets": self.import_csv("assets", self.data_dir / "history_assets.csv"),
+            "balances": 0,
+            "prices": self.import_csv("prices", self.data_dir / "price_history.csv"),
+        }
+        for path in sorted(self.data_dir.glob("portfolio_*.csv")):
+            counts["balances"] += self.import_csv("balances", path)
+        for path in sorted(self.data_dir.glob("balances_*.csv")):
+            counts["balances"] += self.import_balance_log(path)
+        # Also covers databases created before the rollup table existed.
+        if counts["totals"] or not self.conn.execute("SELECT 1 FROM totals_rollup LIMIT 1").fetchone():
+            self.refresh_rollups()
+        return counts
+
+    def refresh_rollups(self, rebuild: bool = False) -> None:
+        """Recompute the downsampled totals from the last rolled-up bucket onward."""
+        cols = COLUMNS["totals"]
+        for resolution, seconds in downsample.RESOLUTIONS.items():
+            if seconds is None:
+                continue
+            last = None if rebuild else self.conn.execute(
+                "SELECT MAX(date_iso) FROM totals_rollup WHERE resolution = ?", (resolution,)
+            ).fetchone()[0]
+            start = downsample.iso(downsample.bucket_floor(downsample.epoch(last), seconds)) if last else None
+            rows = downsample.minmax(self.totals(start=start), seconds, "portfolio_total")
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM totals_rollup WHERE resolution = ? AND date_iso >= ?", (resolution, start or "")
+                )
+                self.conn.executemany(
+                    f"INSERT INTO totals_rollup (resolution, {', '.join(cols)}) VALUES (?, {', '.join('?' * len(cols))})",
+                    [(resolution, *(r.get(c) for c in cols)) for r in rows],
+                )
+
+    # -- querying --
+
+    def _select(
+        self,
+        table: str,
+        start: str | None = None,
+        end: str | None = None,
+        address: str | None = None,
+        coin_type: str | None = None,
+    ) -> list[Row]:
+        clauses: list[str] = []
+        params: list[t.Any] = []
+        for column, op, value in (
+            ("date_iso", ">=", start),
+            ("date_iso", "<=", end),
+            ("address", "=", address),
+            ("coin_type", "=", coin_type),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(COLUMNS[table])} FROM {table}{where} ORDER BY date_iso"
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def totals(self, start: str | None = None, end: str | None = None, resolution: str = "raw") -> list[Row]:
+        """Portfolio totals with ``start <= date_iso <= end`` (ISO strings, inclusive).
+
+        ``resolution`` selects a precomputed downsampling (``hourly``,
+        ``daily``, ``weekly``) instead of every row.
+        """
+        if resolution == "raw":
+            return self._select("totals", start, end)
+        sql, params = self._totals_query(", ".join(COLUMNS["totals"]), resolution, start, end)
+        return [dict(r) for r in self.conn.execute(sql + " ORDER BY date_iso", params)]
+
+    def _totals_query(
+        self, columns: str, resolution: str, start: str | None, end: str | None
+    ) -> tuple[str, list[t.Any]]:
+        if resolution == "raw":
+            sql, params = f"SELECT {columns} FROM totals WHERE date_iso IS NOT NULL", []
+        else:
+            sql, params = f"SELECT {columns} FROM totals_rollup WHERE resolution = ?", [resolution]
+        if start is not None:
+            sql += " AND date_iso >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND date_iso <= ?"
+            params.append(end)
+        return sql, params
+
+    def chart_totals(
+        self,
+        start: str | None = None,
+        end: str | None = None,
+        max_points: int = downsample.MAX_POINTS,
+        resolution: str | None = None,
+    ) -> tuple[str, list[Row]]:
+        """Totals to plot: ``(resolution, rows)`` with at most ``max_points`` rows.
+
+        Without ``resolution`` the finest one whose row count fits is used;
+        if none fits, the weekly rows are reduced further with LTTB.
+        """
+        if resolution is None:
+            resolution = list(downsample.RESOLUTIONS)[-1]
+            for name in downsample.RESOLUTIONS:
+                sql, params = self._totals_query("COUNT(*)", name, start, end)
+                if self.conn.execute(sql, params).fetchone()[0] <= max_points:
+                    resolution = name
+                    break
+        rows = self.totals(start, end, resolution)
+        if len(rows) > max_points:
+            rows = downsample.lttb(rows, max_points, "portfolio_total")
+        return resolution, rows
+
+    def assets(
+        self,
+        start: str | None = None,
+        end: str | None = None,
+        address: str | None = None,
+        coin_type: str | None = None,
+    ) -> list[Row]:
+        """Per-asset USD history, optionally for one address and/or coin type."""
+        return self._select("assets", start, end, address, coin_type)
+
+    def balances(
+        self,
+        start: str | None = None,
+        end: str | None = None,
+        address: str | None = None,
+        coin_type: str | None = None,
+    ) -> list[Row]:
+        """Raw per-address balance log, optionally for one address and/or coin type."""
+        return self._select("balances", start, end, address, coin_type)
+
+    def prices(self, cg_id: str, start: str | None = None, end: str | None = None) -> list[Row]:
+        """Recorded USD quotes for one CoinGecko id."""
+        sql = "SELECT date_iso, cg_id, usd FROM prices WHERE cg_id = ?"
+        params: list[t.Any] = [cg_id]
+        if start is not None:
+            sql += " AND date_iso >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND date_iso <= ?"
+            params.append(end)
+        return [dict(r) for r in self.conn.execute(sql + " ORDER BY date_iso", params)]
+
+    def price_at(self, cg_id: str, when: str) -> float | None:
+        """Last recorded quote at or before ``when``."""
+        row = self.conn.execute(
+            "SELECT usd FROM prices WHERE cg_id = ? AND date_iso <= ? ORDER BY date_iso DESC LIMIT 1",
+            (cg_id, when),
+        ).fetchone()
+        return row["usd"] if row else None
+
+
+def open_store(path: str | Path = DB_PATH, data_dir: str | Path = DATA_DIR) -> HistoryStore:
+    """Open the store and import any CSV rows it has not seen yet."""
+    store = HistoryStore(path, data_dir)
+    store.sync()
+    return store
+
+
+def main() -> None:
+    with HistoryStore() as store:
+        counts = store.sync()
+    print(", ".join(f"{table}: {n} new rows" for table, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Content-addressed archive of raw HTTP exchanges for record/replay runs.
+
+With ``HTTP_ARCHIVE_MODE=record`` every response the fetchers receive is
+stored under ``HTTP_ARCHIVE_DIR`` (default ``.http_archive``); with
+``HTTP_ARCHIVE_MODE=replay`` the same requests are answered from the archive
+and nothing touches the network, so a captured day can be re-run
+deterministically in milliseconds.
+
+Layout::
+
+    index.jsonl          one JSON line per recorded exchange (last one wins)
+    objects/ab/cdef.gz   gzip-compressed response bodies, named by SHA-256
+
+Requests are keyed by a SHA-256 of method, URL and request body, so identical
+bodies (e.g. the same coin metadata on many days) are stored once.
+
+This module only uses the standard library so both ``scripts/http_pool.py``
+and the root-level ``data_fetching.py`` can share it.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import typing as t
+from pathlib import Path
+
+MODE = os.environ.get('HTTP_ARCHIVE_MODE', 'off').lower()
+ARCHIVE_DIR = Path(os.environ.get('HTTP_ARCHIVE_DIR', '.http_archive'))
+
+Headers = t.List[t.Tuple[str, str]]
+
+
+class ArchiveMiss(LookupError):
+    """Replay mode was asked for a request that was never recorded."""
+
+
+def request_key(method: str, url: str, body: bytes | str | None) -> str:
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    h = hashlib.sha256(f'{method.upper()} {url}\n'.encode('utf-8'))
+    h.update(body or b'')
+    return h.hexdigest()
+
+
+class HttpArchive:
+    """Append-only index of exchanges plus a content-addressed blob store."""
+
+    def __init__(self, root: str | Path = ARCHIVE_DIR) -> None:
+        self.root = Path(root)
+        self.index_path = self.root / 'index.jsonl'
+        self.lock = threading.Lock()
+        self.index: dict[str, dict] = {}
+        if self.index_path.exists():
+            for line in self.index_path.read_text().splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.index[entry['key']] = entry
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / 'objects' / digest[:2] / f'{digest[2:]}.gz'
+
+    def put(
+        self,
+        method: str,
+        url: str,
+        body: bytes | str | None,
+        status: int,
+        reason: str,
+        headers: Headers,
+        data: bytes,
+    ) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob_path(digest)
+        entry = {
+            'key': request_key(method, url, body),
+            'method': method.upper(),
+            'url': url,
+            'status': status,
+            'reason': reason,
+            'headers': [[k, v] for k, v in headers],
+            'body': digest,
+        }
+        with self.lock:
+            if not blob.exists():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                tmp = blob.with_name(blob.name + '.tmp')
+                tmp.write_bytes(gzip.compress(data, mtime=0))
+                os.replace(tmp, blob)
+            self.index[entry['key']] = entry
+            with self.index_path.open('a') as f:
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+
+    def get(self, method: str, url: str, body: bytes | str | None) -> tuple[int, str, Headers, bytes]:
+        """Return ``(status, reason, headers, body)``; raise ``ArchiveMiss`` if unknown."""
+        entry = self.index.get(request_key(method, url, body))
+        if entry is None:
+            raise ArchiveMiss(f'{method.upper()} {url} not in archive {self.root}')
+        data = gzip.decompress(self._blob_path(entry['body']).read_bytes())
+        return entry['status'], entry['reason'], [(k, v) for k, v in entry['headers']], data
+
+    # Non-HTTP results (e.g. a Playwright scrape) are stored as pseudo-requests.
+
+    def put_json(self, kind: str, name: str, obj: t.Any) -> None:
+        self.put(kind, name, None, 200, 'OK', [('Content-Type', 'application/json')], json.dumps(obj).encode('utf-8'))
+
+    def get_json(self, kind: str, name: str) -> t.Any:
+        return json.loads(self.get(kind, name, None)[3].decode('utf-8'))
+
+
+_ARCHIVE: HttpArchive | None = None
+_ARCHIVE_LOCK = threading.Lock()
+
+
+def active_archive() -> HttpArchive | None:
+    """The process-wide archive when ``HTTP_ARCHIVE_MODE`` is record or replay."""
+    global _ARCHIVE
+    if MODE not in ('record', 'replay'):
+        return None
+    with _ARCHIVE_LOCK:
+        if _ARCHIVE is None:
+            _ARCHIVE = HttpArchive(ARCHIVE_DIR)
+    return _ARCHIVE
+
+
+def recording() -> bool:
+    return MODE == 'record'
+
+
+def replaying() -> bool:
+    return MODE == 'replay'
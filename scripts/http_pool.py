@@ -0,0 +1,231 @@
+"""Keep-alive HTTP connection pool shared by the fetch scripts.
+
+``urllib.request.urlopen`` opens a new TCP (and TLS) connection for every
+request.  ``urlopen`` here is a drop-in replacement that keeps up to
+``HTTP_POOL_SIZE`` idle connections per host (default 4) and reuses them, so a
+run with hundreds of RPC and API calls pays for a handful of handshakes.
+
+Errors keep the ``urllib`` semantics the callers already handle: HTTP status
+codes >= 400 raise ``urllib.error.HTTPError`` and connection failures raise
+``urllib.error.URLError``.  ``POOL.stats()`` reports, per host, how many
+requests were sent and how many reused an existing connection.
+
+``HTTP_ARCHIVE_MODE=record`` stores every exchange in the archive described in
+``http_archive.py``; ``HTTP_ARCHIVE_MODE=replay`` serves requests from it
+without opening any connection.
+"""
+
+from __future__ import annotations
+
+import http.client
+import io
+import os
+import ssl
+import sys
+import threading
+import typing as t
+import urllib.parse
+import urllib.request
+from urllib.error import HTTPError, URLError
+
+import http_archive
+
+POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 4))
+DEFAULT_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 30))
+MAX_REDIRECTS = 5
+
+# Errors that mean a kept-alive connection was closed by the server while idle.
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+HostKey = t.Tuple[str, str, int]
+
+
+class PooledResponse:
+    """Fully-read response; mirrors the parts of ``urlopen``'s result we use."""
+
+    def __init__(self, url: str, status: int, reason: str, headers: http.client.HTTPMessage, body: bytes) -> None:
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._body = io.BytesIO(body)
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._body.read(amt)
+
+    def getcode(self) -> int:
+        return self.status
+
+    def __enter__(self) -> 'PooledResponse':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._body.close()
+
+
+class HttpPool:
+    """Per-host pool of idle ``http.client`` connections."""
+
+    def __init__(self, pool_size: int = POOL_SIZE, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.idle: dict[HostKey, list[http.client.HTTPConnection]] = {}
+        self.counters: dict[str, dict[str, int]] = {}
+        self.lock = threading.Lock()
+        self.ssl_context = ssl.create_default_context()
+
+    # -- connection bookkeeping --
+
+    def _count(self, host: str, field: str) -> None:
+        with self.lock:
+            c = self.counters.setdefault(host, {'requests': 0, 'connections': 0, 'reused': 0})
+            c[field] += 1
+
+    def _checkout(self, key: HostKey, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        with self.lock:
+            idle = self.idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self._count(host, 'connections')
+        return conn, False
+
+    def _checkin(self, key: HostKey, conn: http.client.HTTPConnection) -> None:
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self.lock:
+            conns = [c for idle in self.idle.values() for c in idle]
+            self.idle.clear()
+        for conn in conns:
+            conn.close()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return ``{host: {'requests', 'connections', 'reused'}}``."""
+        with self.lock:
+            return {h: dict(c) for h, c in self.counters.items()}
+
+    # -- requests --
+
+    def _send(
+        self, key: HostKey, method: str, target: str, body: bytes | None, headers: dict[str, str], timeout: float
+    ) -> tuple[int, str, http.client.HTTPMessage, bytes]:
+        for _ in range(2):
+            conn, reused = self._checkout(key, timeout)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused:
+                    continue  # idle connection went away; retry once on a fresh one
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            self._count(key[1], 'requests')
+            if reused:
+                self._count(key[1], 'reused')
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return resp.status, resp.reason, resp.headers, data
+        raise URLError('connection closed by server')  # pragma: no cover - loop always returns or raises
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None = None,
+        headers: t.Mapping[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> PooledResponse:
+        archive = http_archive.active_archive()
+        if archive is not None and http_archive.replaying():
+            try:
+                status, reason, header_items, data = archive.get(method, url, body)
+            except http_archive.ArchiveMiss as e:
+                raise URLError(e) from e
+            resp_headers = http.client.parse_headers(
+                io.BytesIO(''.join(f'{k}: {v}\r\n' for k, v in header_items).encode('latin-1') + b'\r\n')
+            )
+            final_url = url
+        else:
+            final_url, status, reason, resp_headers, data = self._fetch(method, url, body, headers, timeout)
+            if archive is not None:
+                archive.put(method, url, body, status, reason, list(resp_headers.items()), data)
+        if status >= 400:
+            raise HTTPError(final_url, status, reason, resp_headers, io.BytesIO(data))
+        return PooledResponse(final_url, status, reason, resp_headers, data)
+
+    def _fetch(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None,
+        headers: t.Mapping[str, str] | None,
+        timeout: float | None,
+    ) -> tuple[str, int, str, http.client.HTTPMessage, bytes]:
+        """Send the request over the pool, following redirects."""
+        timeout = self.timeout if timeout is None else timeout
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            scheme = parts.scheme or 'http'
+            port = parts.port or (443 if scheme == 'https' else 80)
+            key = (scheme, parts.hostname or '', port)
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+            try:
+                status, reason, resp_headers, data = self._send(key, method, target, body, headers, timeout)
+            except (OSError, http.client.HTTPException) as e:
+                raise URLError(e) from e
+            if status in (301, 302, 303, 307, 308) and resp_headers.get('Location'):
+                url = urllib.parse.urljoin(url, resp_headers['Location'])
+                if status == 303 or (status in (301, 302) and method == 'POST'):
+                    method, body = 'GET', None
+                continue
+            return url, status, reason, resp_headers, data
+        raise HTTPError(url, status, 'too many redirects', resp_headers, io.BytesIO(data))
+
+
+POOL = HttpPool()
+
+
+def urlopen(req: urllib.request.Request | str, timeout: float | None = None) -> PooledResponse:
+    """Pooled stand-in for ``urllib.request.urlopen``."""
+    if isinstance(req, str):
+        req = urllib.request.Request(req)
+    return POOL.request(req.get_method(), req.full_url, req.data, dict(req.header_items()), timeout)
+
+
+def report_stats(stream: t.TextIO = sys.stderr) -> None:
+    """Print one line per host showing how many requests reused a connection."""
+    for host, c in sorted(POOL.stats().items()):
+        print(
+            f"http {host}: {c['requests']} requests over {c['connections']} connections "
+            f"({c['reused']} reused)",
+            file=stream,
+        )
@@ -0,0 +1,134 @@
+"""Atomic, diff-aware writer for ``latest.json``.
+
+``write_latest`` replaces ``latest.json`` through a temporary file and
+``os.replace``, so readers such as ``summarize_latest.load_json`` see either
+the old or the new snapshot, never a torn one.  It also:
+
+- skips the write when the snapshot equals the one on disk apart from
+  timestamps (every ``date_iso`` field), so ``date_iso`` keeps telling when the
+  content last changed.  The history CSVs still get a row for every run:
+  ``persist`` appends the per-address rows and ``update_history.main`` is
+  given the collected snapshot, both under the run's own ``date_iso``;
+- writes ``latest_diff.json`` next to it on every call (with an empty
+  ``changes`` list when the write was skipped): the changes against the
+  previous snapshot as JSON-pointer style operations, e.g.
+  ``{"op": "replace", "path": "/accounts/0xabc.../balances/0x2::sui::SUI/raw_balance",
+  "old": 1, "new": 2}``.  Accounts are keyed by ``address`` and balances by
+  ``coin_type`` instead of list position, so one new coin is one ``add``.
+
+``SUI_LATEST_COMPACT=1`` writes compact JSON (no indentation or spaces)
+instead of the default ``indent=2``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import typing as t
+
+COMPACT = os.environ.get('SUI_LATEST_COMPACT', '0').lower() in ('1', 'true', 'yes')
+TIMESTAMP_KEYS = frozenset({'date_iso'})
+# List items identified by one of these fields are diffed by key, not position.
+LIST_KEYS = ('address', 'coin_type')
+
+
+def encode(obj: t.Any, compact: bool = COMPACT) -> str:
+    if compact:
+        return json.dumps(obj, separators=(',', ':'))
+    return json.dumps(obj, indent=2)
+
+
+def strip_timestamps(obj: t.Any) -> t.Any:
+    """``obj`` without any ``TIMESTAMP_KEYS`` entries, at any depth."""
+    if isinstance(obj, dict):
+        return {k: strip_timestamps(v) for k, v in obj.items() if k not in TIMESTAMP_KEYS}
+    if isinstance(obj, list):
+        return [strip_timestamps(v) for v in obj]
+    return obj
+
+
+def _pointer(path: str, key: t.Any) -> str:
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _keyed(items: list) -> dict[str, t.Any] | None:
+    for field in LIST_KEYS:
+        if items and all(isinstance(i, dict) and field in i for i in items):
+            keyed = {str(i[field]): i for i in items}
+            if len(keyed) == len(items):
+                return keyed
+    return None
+
+
+def diff(old: t.Any, new: t.Any, path: str = '') -> list[dict[str, t.Any]]:
+    """Operations turning ``old`` into ``new`` (``add``/``remove``/``replace``)."""
+    if isinstance(old, list) and isinstance(new, list):
+        old_keyed, new_keyed = _keyed(old), _keyed(new)
+        if old_keyed is not None and new_keyed is not None:
+            old, new = old_keyed, new_keyed
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict[str, t.Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': _pointer(path, key), 'old': old[key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': _pointer(path, key), 'new': value})
+            else:
+                ops.extend(diff(old[key], value, _pointer(path, key)))
+        return ops
+    if old != new:
+        return [{'op': 'replace', 'path': path, 'old': old, 'new': new}]
+    return []
+
+
+def _load(path: pathlib.Path) -> dict | None:
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _replace(path: pathlib.Path, text: str) -> None:
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        tmp.write_text(text)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def write_latest(
+    latest: dict,
+    path: pathlib.Path,
+    diff_path: pathlib.Path | None = None,
+    compact: bool = COMPACT,
+) -> dict | None:
+    """Write ``latest`` to ``path`` unless only timestamps changed.
+
+    Returns the diff document written to ``diff_path`` (default
+    ``latest_diff.json`` beside ``path``), or ``None`` when ``latest.json``
+    was left alone; the diff file then still describes this run, with an
+    empty ``changes`` list, so it never reports an older change as current.
+    Without a readable previous snapshot the diff is a single ``add`` of the
+    root.
+    """
+    diff_path = diff_path or path.with_name('latest_diff.json')
+    previous = _load(path)
+    if previous is not None:
+        changes = diff(strip_timestamps(previous), strip_timestamps(latest))
+    else:
+        changes = [{'op': 'add', 'path': ''}]
+    document = {
+        'previous_date_iso': (previous or {}).get('date_iso'),
+        'date_iso': latest.get('date_iso'),
+        'changes': changes,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if changes:
+        _replace(path, encode(latest, compact))
+    _replace(diff_path, encode(document, compact))
+    return document if changes else None
@@ -0,0 +1,301 @@
+"""OpenMetrics exposition of snapshot runs and portfolio values.
+
+Everything is derived from files the pipeline already writes:
+``latest.json`` (totals computed by ``sui_daily_portfolio.main``),
+``run_metrics.json`` (fetch latencies and errors) and the ``*_error.json``
+files of the DeFi fetchers.  Two ways to expose it:
+
+- textfile collector: set ``METRICS_TEXTFILE`` (e.g.
+  ``/var/lib/node_exporter/textfile/suiport.prom``) and
+  ``run_daily_snapshot`` rewrites it atomically after every run, or run
+  ``python scripts/openmetrics.py --textfile PATH``;
+- HTTP: ``python scripts/openmetrics.py --serve 9108`` answers
+  ``GET /metrics``, re-reading the files on every scrape so the staleness
+  gauge stays current.
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+import json
+import os
+import pathlib
+import threading
+import time
+import typing as t
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fetch_defi_blockvision
+import fetch_protocol_data
+import price_cache
+import sui_rpc
+
+OUT_DIR = pathlib.Path(os.environ.get('OUT_DIR', 'data'))
+TEXTFILE = os.environ.get('METRICS_TEXTFILE') or ''
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'suiport'
+
+
+def _host(url: str) -> str:
+    return urllib.parse.urlsplit(url).hostname or ''
+
+
+def source_for_host(host: str) -> str:
+    """Map an HTTP host to the data source it serves (``rpc``, ``coingecko``...)."""
+    known = {
+        _host(sui_rpc.RPC_URL): 'rpc',
+        _host(price_cache.CG_URL): 'coingecko',
+        _host(fetch_defi_blockvision.BASE): 'blockvision',
+    }
+    for proto, url_fn in fetch_protocol_data.PROTOCOL_ENDPOINTS.items():
+        known.setdefault(_host(url_fn('0x0')), proto)
+    return known.get(host, host)
+
+
+def _escape(value: t.Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Exposition:
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+
+    def family(self, name: str, kind: str, help_text: str, unit: str = '') -> None:
+        self.lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+        if unit:
+            self.lines.append(f'# UNIT {PREFIX}_{name} {unit}')
+        self.lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+
+    def sample(self, name: str, value: float, **labels: t.Any) -> None:
+        label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        self.lines.append(f'{PREFIX}_{name}{{{label_str}}} {_fmt(value)}' if labels else f'{PREFIX}_{name} {_fmt(value)}')
+
+    def histogram(self, name: str, stat: dict[str, t.Any], bounds: t.Sequence[float], **labels: t.Any) -> None:
+        cumulative = 0
+        for bound, n in zip(list(bounds) + [float('inf')], stat['buckets']):
+            cumulative += n
+            self.sample(f'{name}_bucket', cumulative, **labels, le=_fmt(float(bound)))
+        self.sample(f'{name}_count', cumulative, **labels)
+        self.sample(f'{name}_sum', float(stat['seconds']), **labels)
+
+    def text(self) -> str:
+        return '\n'.join(self.lines + ['# EOF']) + '\n'
+
+
+def _load(path: pathlib.Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _epoch(date_iso: str | None) -> float | None:
+    if not date_iso:
+        return None
+    try:
+        return float(calendar.timegm(time.strptime(date_iso.rstrip('Z')[:19], '%Y-%m-%dT%H:%M:%S')))
+    except ValueError:
+        return None
+
+
+def last_success(run: dict | None) -> float | None:
+    """Unix time the last successful run finished, from run metrics."""
+    if not run:
+        return None
+    if 'last_success_at' in run:
+        return _epoch(run['last_success_at'])
+    # In-memory run metrics of the daemon, which keeps only successful cycles.
+    return _epoch(run.get('finished_at')) if run.get('ok', True) else None
+
+
+def error_files(out_dir: pathlib.Path) -> dict[str, int]:
+    """Count the ``*_error.json`` files present per source."""
+    counts: dict[str, int] = {}
+    for p in out_dir.glob('*_error.json'):
+        source = p.name.split('_', 1)[0]
+        source = 'blockvision' if source == 'defi' else source
+        counts[source] = counts.get(source, 0) + 1
+    return counts
+
+
+def render(
+    latest: dict,
+    run: dict | None = None,
+    errors: t.Mapping[str, int] | None = None,
+    now: float | None = None,
+) -> str:
+    """OpenMetrics text for a ``latest.json`` payload and optional run metrics."""
+    now = time.time() if now is None else now
+    out = _Exposition()
+
+    out.family('portfolio_value_usd', 'gauge', 'Portfolio value per address and protocol from latest.json.')
+    for acc in latest.get('accounts') or []:
+        addr = acc.get('address', '')
+        out.sample('portfolio_value_usd', float((acc.get('totals') or {}).get('wallet_usd') or 0),
+                   address=addr, protocol='wallet')
+        suilend = ((acc.get('defi') or {}).get('suilend_summary') or {})
+        out.sample('portfolio_value_usd', float(suilend.get('net_usd') or 0), address=addr, protocol='suilend')
+
+    totals = latest.get('totals_usd') or {}
+    out.family('portfolio_total_usd', 'gauge', 'Sum of wallet and Suilend net value over all addresses.')
+    out.sample('portfolio_total_usd', float(totals.get('portfolio_total') or 0))
+
+    # latest.json is only rewritten when its content changes, so its date_iso
+    # is the last change; staleness is measured from the last successful run.
+    updated = _epoch(latest.get('date_iso'))
+    if updated is not None:
+        out.family('latest_snapshot_timestamp_seconds', 'gauge',
+                   'When the content of latest.json last changed (Unix time).')
+        out.sample('latest_snapshot_timestamp_seconds', updated)
+    succeeded = last_success(run)
+    if succeeded is not None:
+        out.family('last_success_timestamp_seconds', 'gauge', 'When the last successful run finished (Unix time).')
+        out.sample('last_success_timestamp_seconds', succeeded)
+    fresh = succeeded if succeeded is not None else updated
+    if fresh is not None:
+        out.family('latest_snapshot_age_seconds', 'gauge',
+                   'Seconds since the last successful run (latest.json date_iso without run metrics).',
+                   unit='seconds')
+        out.sample('latest_snapshot_age_seconds', round(now - fresh, 3))
+
+    if run:
+        bounds = run.get('latency_buckets') or []
+        hosts = run.get('hosts') or {}
+        methods = run.get('rpc_methods') or {}
+
+        out.family('run_duration_seconds', 'gauge', 'Wall time of the last run.', unit='seconds')
+        out.sample('run_duration_seconds', float(run.get('seconds') or 0))
+        out.family('stage_duration_seconds', 'gauge', 'Wall time of each stage of the last run.', unit='seconds')
+        for s in run.get('spans') or []:
+            if '/' not in s['name']:
+                out.sample('stage_duration_seconds', float(s['seconds']), stage=s['name'])
+        out.family('stage_written_bytes', 'gauge', 'Bytes written by each stage of the last run.', unit='bytes')
+        for stage, n in (run.get('bytes_written') or {}).items():
+            out.sample('stage_written_bytes', n, stage=stage)
+
+        out.family('fetch_latency_seconds', 'histogram', 'HTTP request latency per host.', unit='seconds')
+        for host, stat in sorted(hosts.items()):
+            out.histogram('fetch_latency_seconds', stat, bounds, host=host, source=source_for_host(host))
+        out.family('rpc_latency_seconds', 'histogram', 'JSON-RPC batch latency per method.', unit='seconds')
+        for method, stat in sorted(methods.items()):
+            out.histogram('rpc_latency_seconds', stat, bounds, method=method)
+
+        by_source: dict[str, dict[str, int]] = {}
+        for host, stat in hosts.items():
+            agg = by_source.setdefault(source_for_host(host), {'requests': 0, 'errors': 0, 'retries': 0})
+            for k in agg:
+                agg[k] += int(stat.get(k) or 0)
+        for field, help_text in (
+            ('requests', 'HTTP requests per source in the last run.'),
+            ('errors', 'Failed HTTP requests per source in the last run.'),
+            ('retries', 'HTTP retries per source in the last run.'),
+        ):
+            out.family(f'fetch_{field}', 'gauge', help_text)
+            for source, agg in sorted(by_source.items()):
+                out.sample(f'fetch_{field}', agg[field], source=source)
+        out.family('rpc_errors', 'gauge', 'Failed JSON-RPC calls per method in the last run.')
+        for method, stat in sorted(methods.items()):
+            out.sample('rpc_errors', int(stat.get('errors') or 0), method=method)
+
+    if errors is not None:
+        out.family('source_error_files', 'gauge', 'Error files (*_error.json) currently present per source.')
+        for source, n in sorted(errors.items()):
+            out.sample('source_error_files', n, source=source)
+
+    return out.text()
+
+
+def render_dir(out_dir: pathlib.Path = OUT_DIR, run: dict | None = None) -> str:
+    """Render from the files in ``out_dir``; ``run`` overrides ``run_metrics.json``."""
+    return render(
+        _load(out_dir / 'latest.json'),
+        run if run is not None else _load(out_dir / 'run_metrics.json'),
+        error_files(out_dir),
+    )
+
+
+def write_textfile(path: str | pathlib.Path, out_dir: pathlib.Path = OUT_DIR, run: dict | None = None) -> None:
+    """Atomically (re)write a node_exporter textfile-collector file."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(render_dir(out_dir, run))
+    os.replace(tmp, path)
+
+
+RunSource = t.Callable[[], t.Optional[dict]]
+
+
+def make_server(
+    port: int,
+    out_dir: pathlib.Path = OUT_DIR,
+    host: str = '',
+    run_source: RunSource | None = None,
+) -> ThreadingHTTPServer:
+    """HTTP server answering ``GET /metrics``; call ``serve_forever`` on it.
+
+    ``run_source`` supplies in-memory run metrics instead of re-reading
+    ``run_metrics.json`` (the daemon does not rewrite it on idle cycles).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            if urllib.parse.urlsplit(self.path).path != '/metrics':
+                self.send_error(404)
+                return
+            body = render_dir(out_dir, run_source() if run_source else None).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: t.Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(
+    port: int,
+    out_dir: pathlib.Path = OUT_DIR,
+    run_source: RunSource | None = None,
+) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a background thread (for long-running modes)."""
+    server = make_server(port, out_dir, run_source=run_source)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Expose SuiPort snapshot metrics in OpenMetrics format')
+    parser.add_argument('--out-dir', type=pathlib.Path, default=OUT_DIR)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--textfile', type=pathlib.Path, help='write a textfile-collector file and exit')
+    group.add_argument('--serve', type=int, metavar='PORT', help='serve GET /metrics on PORT')
+    args = parser.parse_args(argv)
+    if args.textfile:
+        write_textfile(args.textfile, args.out_dir)
+    elif args.serve:
+        server = make_server(args.serve, args.out_dir)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(render_dir(args.out_dir), end='')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
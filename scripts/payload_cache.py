@@ -0,0 +1,127 @@
+"""Reuse of unchanged API payloads for the JSON fetchers.
+
+``fetch_protocol_data`` and ``fetch_defi_blockvision`` save one JSON file
+per address and source.  ``PayloadCache`` avoids redoing that work when the
+data did not change:
+
+- the ``ETag`` / ``Last-Modified`` of every response is kept in
+  ``data/http_validators.json``, and the next request for the same URL is a
+  conditional GET; a ``304 Not Modified`` leaves the existing file alone;
+- ``write_json`` compares the new pretty-printed JSON with the file on disk
+  and skips the write when they match, so unchanged payloads keep their
+  mtime and produce no diff in the committed data.
+
+Both fetchers keep their validators in the same file, so ``save`` re-reads
+it and applies only the URLs this instance changed instead of overwriting
+the other fetcher's entries.
+
+Conditional headers are only sent when the target file exists, and never
+while ``http_archive`` records or replays (a recorded 304 would be useless
+to a fresh replay).  ``report`` prints how many payloads were reused.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import os
+import pathlib
+import sys
+import threading
+import typing as t
+
+import fetch_client
+import http_archive
+
+
+class PayloadCache:
+    """Validators per URL plus skip-if-identical JSON writes (thread-safe)."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: dict[str, dict[str, str]] | None = None
+        # URL -> new validators (``None``: forget the URL) since the last save.
+        self.changed: dict[str, dict[str, str] | None] = {}
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def _read(self) -> dict[str, dict[str, str]]:
+        try:
+            loaded = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            loaded = {}
+        return loaded if isinstance(loaded, dict) else {}
+
+    def _entries(self) -> dict[str, dict[str, str]]:
+        # Caller holds the lock.  Loaded lazily: importing a fetcher must not touch the data dir.
+        if self.entries is None:
+            self.entries = self._read()
+        return self.entries
+
+    def fetch_json(
+        self,
+        url: str,
+        target: pathlib.Path,
+        headers: t.Mapping[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> t.Any:
+        """Fetch ``url`` for ``target``; ``None`` means ``target`` is still current."""
+        with self.lock:
+            validators = dict(self._entries().get(url) or {})
+        if not target.exists() or http_archive.active_archive() is not None:
+            validators = {}
+        data, fresh = fetch_client.get_json_conditional(url, validators, headers=headers, timeout=timeout)
+        with self.lock:
+            entries = self._entries()
+            if data is None:
+                self.counts['not_modified'] += 1
+            elif fresh != entries.get(url, {}):
+                if fresh:
+                    entries[url] = fresh
+                else:
+                    entries.pop(url, None)
+                self.changed[url] = fresh or None
+        return data
+
+    def write_json(self, path: pathlib.Path, obj: t.Any) -> bool:
+        """Write ``obj`` as indented JSON unless ``path`` already holds exactly that."""
+        data = json.dumps(obj, indent=2).encode('utf-8')
+        try:
+            unchanged = path.read_bytes() == data
+        except OSError:
+            unchanged = False
+        with self.lock:
+            self.counts['unchanged' if unchanged else 'written'] += 1
+        if unchanged:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return True
+
+    def save(self) -> None:
+        """Merge this instance's changes into the file on disk."""
+        with self.lock:
+            if not self.changed:
+                return
+            merged = self._read()
+            for url, validators in self.changed.items():
+                if validators:
+                    merged[url] = validators
+                else:
+                    merged.pop(url, None)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(merged, indent=2, sort_keys=True))
+            os.replace(tmp, self.path)
+            self.entries = merged
+            self.changed = {}
+
+    def report(self, label: str, stream: t.TextIO = sys.stderr) -> None:
+        with self.lock:
+            c = dict(self.counts)
+        reused = c.get('not_modified', 0) + c.get('unchanged', 0)
+        print(
+            f"{label}: {reused} payloads reused ({c.get('not_modified', 0)} not modified, "
+            f"{c.get('unchanged', 0)} unchanged), {c.get('written', 0)} written",
+            file=stream,
+        )
@@ -0,0 +1,205 @@
+"""Long-running snapshot daemon with in-memory state.
+
+``run_daily_snapshot.py`` is a cold start: every run re-imports, reconnects
+and re-reads its caches.  This entry point stays resident and refreshes every
+``SUI_DAEMON_INTERVAL_MINUTES`` (default 15) instead:
+
+- coin metadata (``CoinMetadataCache``), USD quotes (``price_cache``) and the
+  keep-alive connections of ``http_pool`` live across cycles;
+- the last snapshot is kept in memory, so change detection
+  (``suix_queryTransactionBlocks``) only refetches addresses with new
+  transactions;
+- ``latest.json``, the per-address CSVs, the report, the history files and
+  ``run_metrics.json`` are written through the usual writers only when the
+  snapshot content (balances, objects, Suilend data or prices) changed.
+
+With ``--metrics-port`` (or ``METRICS_PORT``) the OpenMetrics endpoint from
+``openmetrics.py`` is served from the same process.
+
+With ``--events checkpoints|transactions`` (or ``SUI_EVENTS``) the daemon
+also polls an event source from ``chain_events.py`` every
+``SUI_EVENTS_POLL_SECONDS`` and re-collects only the addresses touched by new
+transactions, once a burst has settled; the interval refresh still runs (it
+picks up price moves).
+
+    python scripts/portfolio_daemon.py --interval 5 --metrics-port 9108
+    python scripts/portfolio_daemon.py --interval 60 --events checkpoints
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import signal
+import sys
+import threading
+import time
+import typing as t
+
+import chain_events
+import fetch_client
+import openmetrics
+import run_metrics
+import sui_daily_portfolio
+import summarize_latest
+import update_history
+from coin_metadata_cache import CoinMetadataCache
+
+INTERVAL_MINUTES = float(os.environ.get('SUI_DAEMON_INTERVAL_MINUTES', 15))
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+
+
+def _now() -> str:
+    return dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat().replace('+00:00', 'Z')
+
+
+class SnapshotDaemon:
+    """Refresh the snapshot on an interval, persisting only real changes."""
+
+    def __init__(
+        self,
+        interval: float = INTERVAL_MINUTES * 60,
+        incremental: bool = True,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.interval = interval
+        self.incremental = incremental
+        self.clock = clock
+        self.out_dir = sui_daily_portfolio.OUT_DIR
+        self.meta_cache = CoinMetadataCache()
+        self.latest: dict | None = summarize_latest.load_json(self.out_dir / 'latest.json') or None
+        self.fingerprint = sui_daily_portfolio.snapshot_fingerprint(self.latest) if self.latest else None
+        self.last_run: dict | None = None
+        self.stop_event = threading.Event()
+        self.cycles = 0
+        self.writes = 0
+
+    def previous_accounts(self) -> dict[str, dict]:
+        return {acc['address']: acc for acc in (self.latest or {}).get('accounts') or [] if acc.get('address')}
+
+    def refresh(self, addresses: t.Collection[str] | None = None) -> bool:
+        """Run one collection cycle; return whether anything was written.
+
+        With ``addresses``, only those are refetched and the other accounts
+        are carried over from the in-memory snapshot.
+        """
+        run = run_metrics.RUN
+        run.reset()
+        fetch_client.METRICS.reset()
+        previous = self.previous_accounts()
+        if addresses is not None and not previous:
+            addresses = None
+        with run.span('collection'):
+            latest, rows_by_address = sui_daily_portfolio.collect(
+                self.meta_cache, previous, self.incremental, refresh=addresses
+            )
+        fingerprint = sui_daily_portfolio.snapshot_fingerprint(latest)
+        changed = fingerprint != self.fingerprint
+        if changed:
+            with run.stage('persist', self.out_dir):
+                sui_daily_portfolio.persist(latest, rows_by_address)
+                summarize_latest.render_to_file(
+                    self.out_dir / 'latest.json',
+                    self.out_dir / 'latest_report.md',
+                    cache_path=summarize_latest.CACHE_PATH or self.out_dir / 'report_cache.sqlite',
+                )
+                update_history.main(latest)
+            self.writes += 1
+        # Keep the newest snapshot even when unchanged: its last_tx digests
+        # drive change detection on the next cycle.
+        self.latest = latest
+        self.fingerprint = fingerprint
+        self.cycles += 1
+        self.last_run = run.to_dict()
+        if changed:
+            run.write(self.out_dir / 'run_metrics.json')
+        if openmetrics.TEXTFILE:
+            openmetrics.write_textfile(openmetrics.TEXTFILE, self.out_dir, self.last_run)
+        return changed
+
+    def _cycle(self, addresses: t.Collection[str] | None = None) -> None:
+        start = self.clock()
+        scope = f'{len(addresses)} address(es)' if addresses is not None else 'all addresses'
+        try:
+            changed = self.refresh(addresses)
+            print(
+                f"{_now()} refresh of {scope} {'wrote snapshot' if changed else 'unchanged'} "
+                f"in {self.clock() - start:.2f}s",
+                file=sys.stderr,
+            )
+        except Exception as e:  # noqa: BLE001 - keep the daemon alive, retry next interval
+            print(f'{_now()} refresh of {scope} failed: {e}', file=sys.stderr)
+
+    def run_forever(self) -> None:
+        next_at = self.clock()
+        while not self.stop_event.is_set():
+            self._cycle()
+            next_at = max(next_at + self.interval, self.clock())
+            self.stop_event.wait(max(0.0, next_at - self.clock()))
+
+    def run_events(
+        self,
+        source: chain_events.EventSource,
+        queue: chain_events.RefreshQueue | None = None,
+        poll_interval: float = chain_events.POLL_SECONDS,
+    ) -> None:
+        """Refresh the addresses reported by ``source``, plus everything every interval."""
+        queue = queue if queue is not None else chain_events.RefreshQueue()
+        # Prime the source first so no event between it and the first refresh is lost.
+        source.poll()
+        next_full = self.clock()
+        while not self.stop_event.is_set():
+            if self.clock() >= next_full:
+                queue.clear()
+                self._cycle()
+                next_full = max(next_full + self.interval, self.clock())
+            try:
+                queue.add(source.poll())
+            except Exception as e:  # noqa: BLE001 - a failed poll is retried on the next tick
+                print(f'{_now()} event poll failed: {e}', file=sys.stderr)
+            batch = queue.take()
+            if batch:
+                self._cycle(batch)
+            self.stop_event.wait(max(0.0, min(poll_interval, next_full - self.clock())))
+
+    def stop(self, *_: object) -> None:
+        self.stop_event.set()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Refresh the portfolio snapshot on an interval')
+    parser.add_argument('--interval', type=float, default=INTERVAL_MINUTES, help='minutes between refreshes')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help='serve /metrics on this port')
+    parser.add_argument('--no-incremental', action='store_true', help='refetch every address each cycle')
+    parser.add_argument('--once', action='store_true', help='run a single cycle and exit')
+    parser.add_argument(
+        '--events', choices=['checkpoints', 'transactions'], default=chain_events.SOURCE or None,
+        help='also refresh the addresses touched by new transactions as they happen',
+    )
+    args = parser.parse_args(argv)
+
+    daemon = SnapshotDaemon(args.interval * 60, incremental=not args.no_incremental)
+    if args.once:
+        daemon.refresh()
+        fetch_client.report_stats()
+        return 0
+    server = None
+    if args.metrics_port:
+        server = openmetrics.start_server(args.metrics_port, daemon.out_dir, run_source=lambda: daemon.last_run)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    try:
+        if args.events:
+            heads = {a: acc['last_tx'] for a, acc in daemon.previous_accounts().items() if acc.get('last_tx')}
+            daemon.run_events(chain_events.make_source(args.events, sui_daily_portfolio.ADDRESSES, heads))
+        else:
+            daemon.run_forever()
+    finally:
+        if server is not None:
+            server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -2,17 +2,23 @@
 
 Reads ``data/latest.json`` (produced by ``sui_daily_portfolio.py``) and writes a
 ``dashboard.html`` file that uses Chart.js to render a stacked bar chart of
-wallet and Suilend balances for each address. No Python dependencies are
-required beyond the standard library.
+wallet and Suilend balances for each address, plus a line chart of the
+portfolio totals history.  The history comes from ``history_store`` at the
+finest precomputed resolution that fits ``CHART_MAX_POINTS`` (see
+``downsample``).  No Python dependencies are required beyond the standard
+library.
 """
 
 import json
 import pathlib
 from string import Template
 
+from history_store import open_store
+
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
-DATA_FILE = ROOT / 'data' / 'latest.json'
+DATA_DIR = ROOT / 'data'
+DATA_FILE = DATA_DIR / 'latest.json'
 OUT_FILE = ROOT / 'dashboard.html'
 
 
@@ -28,6 +34,8 @@ HTML_TEMPLATE = Template(
 <body>
   <h1>Portfolio Summary (Total $$total)</h1>
   <canvas id="chart" width="800" height="400"></canvas>
+  <h2>History ($history_points points, $history_resolution)</h2>
+  <canvas id="history" width="800" height="300"></canvas>
   <script>
     const labels = $labels;
     const wallet = $wallet;
@@ -50,6 +58,23 @@ HTML_TEMPLATE = Template(
         }
       }
     });
+    const history = $history;
+    new Chart(document.getElementById('history').getContext('2d'), {
+      type: 'line',
+      data: {
+        labels: history.labels,
+        datasets: [
+          {label: 'Portfolio USD', data: history.portfolio_total, borderColor: 'rgb(75,192,192)'},
+          {label: 'Wallet USD', data: history.wallet_sum, borderColor: 'rgb(54,162,235)'},
+          {label: 'Suilend Net USD', data: history.suilend_net, borderColor: 'rgb(255,99,132)'}
+        ]
+      },
+      options: {
+        responsive: true,
+        animation: false,
+        elements: {point: {radius: history.labels.length > 200 ? 0 : 2}}
+      }
+    });
   </script>
 </body>
 </html>
@@ -72,13 +97,30 @@ def load_data() -> tuple[list[str], list[float], list[float], float]:
     return labels, wallet_usd, suilend_net, total
 
 
+def load_history() -> tuple[str, dict[str, list]]:
+    """Downsampled totals history as Chart.js series, with the resolution used."""
+    with open_store(DATA_DIR / 'history.sqlite', DATA_DIR) as store:
+        resolution, rows = store.chart_totals()
+    series: dict[str, list] = {
+        'labels': [r['date_iso'] for r in rows],
+        'portfolio_total': [r['portfolio_total'] for r in rows],
+        'wallet_sum': [r['wallet_sum'] for r in rows],
+        'suilend_net': [r['suilend_net'] for r in rows],
+    }
+    return resolution, series
+
+
 def make_dashboard() -> None:
     labels, wallet_usd, suilend_net, total = load_data()
+    resolution, history = load_history()
     html = HTML_TEMPLATE.substitute(
         labels=json.dumps(labels),
         wallet=json.dumps(wallet_usd),
         suilend=json.dumps(suilend_net),
         total=f"{total:.2f}",
+        history=json.dumps(history),
+        history_points=len(history['labels']),
+        history_resolution=resolution,
     )
     OUT_FILE.write_text(html)
     print(f'Wrote {OUT_FILE}')
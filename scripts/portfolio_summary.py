@@ -1,10 +1,12 @@
+import functools
 import os
 import json
-import time
-import urllib.request
-from urllib.error import URLError
 from pathlib import Path
 
+import price_cache
+from coin_metadata_cache import CoinMetadataCache
+from sui_rpc import RpcError, fetch_coin_metadata, rpc, rpc_batch
+
 SUI_RPC_URL = os.environ.get('SUI_RPC_URL', 'https://fullnode.mainnet.sui.io:443')
 ADDRS_ENV = os.environ.get('SUI_ADDRESSES') or ''
 ADDRESSES = [a.strip() for a in ADDRS_ENV.split(',') if a.strip()]
@@ -13,35 +15,20 @@ if not ADDRESSES:
         '0xa63ef51b8abf601fb40d8514050a8d5613c0509d4b36323dc4439ee6c69d704e',
     ]
 
-def rpc_call(method: str, params: list) -> dict:
-    payload = {
-        'jsonrpc': '2.0',
-        'id': 1,
-        'method': method,
-        'params': params,
-    }
-    data_bytes = json.dumps(payload).encode('utf-8')
-    req = urllib.request.Request(
-        SUI_RPC_URL, data=data_bytes, headers={'Content-Type': 'application/json'}
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-    except URLError as e:  # network issues should not crash the script
-        raise RuntimeError(f"network error: {e}")
-    if 'error' in data:
-        raise RuntimeError(f"RPC error: {data['error']}")
-    return data['result']
-
 def get_all_balances(address: str) -> list:
-    return rpc_call('suix_getAllBalances', [address])
+    return rpc('suix_getAllBalances', [address], url=SUI_RPC_URL)
 
 def get_coin_metadata(coin_type: str) -> dict | None:
     try:
-        return rpc_call('suix_getCoinMetadata', [coin_type])
-    except RuntimeError:
+        return rpc('suix_getCoinMetadata', [coin_type], url=SUI_RPC_URL)
+    except RpcError:
         return None
 
+def get_all_balances_many(addresses: list[str]) -> list:
+    """Batched balances; failed addresses come back as ``RpcError`` instances."""
+    calls = [('suix_getAllBalances', [a]) for a in addresses]
+    return rpc_batch(calls, url=SUI_RPC_URL, return_exceptions=True)
+
 # CoinGecko id mapping for pricing
 CG_IDS = {
     'sui': 'sui',
@@ -57,19 +44,10 @@ def fetch_prices(symbols: set[str]) -> dict:
     id_map = {s: CG_IDS[s.lower()] for s in symbols if s.lower() in CG_IDS}
     if not id_map:
         return {}
-    ids = ','.join(sorted(set(id_map.values())))
-    url = f'https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies=usd'
-    req = urllib.request.Request(
-        url, headers={'Accept': 'application/json', 'User-Agent': 'portfolio-bot/1.0'}
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-    except URLError:
-        return {}
+    data = price_cache.get_prices(set(id_map.values()))
     prices = {}
     for sym, cid in id_map.items():
-        price = data.get(cid, {}).get('usd')
+        price = data.get(cid)
         if price is not None:
             prices[sym] = float(price)
     return prices
@@ -116,24 +94,29 @@ def summarize_suilend(addr: str, symbols: set[str]) -> dict | None:
 def main() -> None:
     results = []
     symbols: set[str] = set()
-    for addr in ADDRESSES:
-        try:
-            balances = get_all_balances(addr)
-        except RuntimeError as e:
-            balances = []
-            print(f"\nAddress {addr} (wallet fetch failed: {e})")
+    meta_cache = CoinMetadataCache()
+    all_balances = get_all_balances_many(ADDRESSES)
+    for i, (addr, balances) in enumerate(zip(ADDRESSES, all_balances)):
+        if isinstance(balances, RpcError):
+            print(f"\nAddress {addr} (wallet fetch failed: {balances})")
+            all_balances[i] = []
+    metas = meta_cache.resolve(
+        [b.get('coinType') for balances in all_balances for b in balances],
+        functools.partial(fetch_coin_metadata, url=SUI_RPC_URL),
+    )
+    meta_cache.save()
+    for addr, balances in zip(ADDRESSES, all_balances):
         entries = []
         for b in balances:
             coin_type = b.get('coinType')
             raw = int(b.get('totalBalance', '0') or 0)
-            meta = get_coin_metadata(coin_type) or {}
+            meta = metas.get(coin_type) or {}
             symbol = meta.get('symbol') or coin_type.split('::')[-1]
             decimals = int(meta.get('decimals') or 0)
             human = raw / (10 ** decimals) if decimals >= 0 else raw
             entries.append({'symbol': symbol, 'balance': human, 'coin_type': coin_type})
             if symbol:
                 symbols.add(symbol)
-            time.sleep(0.02)
         defi = summarize_suilend(addr, symbols)
         results.append({'address': addr, 'entries': entries, 'suilend': defi})
     prices = fetch_prices(symbols)
@@ -0,0 +1,159 @@
+"""Shared USD price layer with a TTL cache and a local price history.
+
+Both ``sui_daily_portfolio.fetch_prices_cg`` and
+``portfolio_summary.fetch_prices`` go through ``get_prices``:
+
+- quotes younger than ``PRICE_TTL`` seconds (default 300) come from
+  ``data/price_cache.json`` without touching the network;
+- missing or expired ids are fetched from CoinGecko in one request;
+- if that request fails, cached quotes up to ``PRICE_MAX_STALE`` seconds old
+  (default one day) are served instead of an empty price map;
+- every quote fetched is appended to ``data/price_history.csv`` so past
+  snapshots can be revalued offline with ``prices_at``.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import json
+import os
+import pathlib
+import sys
+import time
+import typing as t
+
+import fetch_client
+
+OUT_DIR = pathlib.Path(os.environ.get('OUT_DIR', 'data'))
+CACHE_PATH = pathlib.Path(os.environ.get('PRICE_CACHE') or OUT_DIR / 'price_cache.json')
+HISTORY_PATH = pathlib.Path(os.environ.get('PRICE_HISTORY') or OUT_DIR / 'price_history.csv')
+TTL_SECONDS = float(os.environ.get('PRICE_TTL', 300))
+MAX_STALE_SECONDS = float(os.environ.get('PRICE_MAX_STALE', 24 * 3600))
+
+CG_URL = os.environ.get('COINGECKO_URL', 'https://api.coingecko.com') + '/api/v3/simple/price'
+HISTORY_FIELDS = ['date_iso', 'cg_id', 'usd']
+
+Fetcher = t.Callable[[t.Set[str]], t.Dict[str, float]]
+
+
+def fetch_coingecko(ids: t.Set[str]) -> dict[str, float]:
+    """Live ``simple/price`` quotes; raises ``URLError`` on network failure."""
+    q = ','.join(sorted(ids))
+    url = f'{CG_URL}?ids={q}&vs_currencies=usd'
+    data = fetch_client.get_json(url, headers={'User-Agent': 'portfolio-bot/1.0'}, timeout=20)
+    return {k: float(v['usd']) for k, v in data.items() if isinstance(v, dict) and v.get('usd') is not None}
+
+
+def _iso(ts: float) -> str:
+    return dt.datetime.fromtimestamp(int(ts), dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class PriceCache:
+    """``cg_id -> {'usd', 'fetched_at'}`` map persisted as JSON."""
+
+    def __init__(
+        self,
+        path: str | pathlib.Path = CACHE_PATH,
+        history_path: str | pathlib.Path | None = HISTORY_PATH,
+        ttl: float = TTL_SECONDS,
+        max_stale: float = MAX_STALE_SECONDS,
+        clock: t.Callable[[], float] = time.time,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.history_path = pathlib.Path(history_path) if history_path else None
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.clock = clock
+        self.quotes: dict[str, dict] = self._load()
+        self.stale_served: set[str] = set()
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            obj = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        quotes = obj.get('quotes') if isinstance(obj, dict) else None
+        return quotes if isinstance(quotes, dict) else {}
+
+    def _age(self, cg_id: str) -> float | None:
+        q = self.quotes.get(cg_id)
+        if not isinstance(q, dict):
+            return None
+        return self.clock() - float(q.get('fetched_at') or 0)
+
+    def get_prices(self, ids: t.Iterable[str], fetch: Fetcher = fetch_coingecko) -> dict[str, float]:
+        """USD prices for ``ids``; ids with no usable quote are left out."""
+        ids = set(ids)
+        out: dict[str, float] = {}
+        missing: set[str] = set()
+        for cg_id in ids:
+            age = self._age(cg_id)
+            if age is not None and age <= self.ttl:
+                out[cg_id] = float(self.quotes[cg_id]['usd'])
+            else:
+                missing.add(cg_id)
+        if not missing:
+            return out
+
+        try:
+            fetched = fetch(missing)
+        except Exception as e:  # noqa: BLE001 - any outage falls back to stale quotes
+            print(f'price fetch failed, serving cached quotes: {e}', file=sys.stderr)
+            fetched = {}
+        if fetched:
+            self._record(fetched)
+        for cg_id in missing:
+            if cg_id in fetched:
+                out[cg_id] = fetched[cg_id]
+                continue
+            age = self._age(cg_id)
+            if age is not None and age <= self.max_stale:
+                out[cg_id] = float(self.quotes[cg_id]['usd'])
+                self.stale_served.add(cg_id)
+        return out
+
+    def _record(self, fetched: dict[str, float]) -> None:
+        now = int(self.clock())
+        for cg_id, usd in fetched.items():
+            self.quotes[cg_id] = {'usd': usd, 'fetched_at': now}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps({'version': 1, 'quotes': self.quotes}, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+        if self.history_path is not None:
+            append_history(self.history_path, _iso(now), fetched)
+
+
+def append_history(path: pathlib.Path, date_iso: str, prices: t.Mapping[str, float]) -> None:
+    write_header = not path.exists()
+    with path.open('a', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=HISTORY_FIELDS)
+        if write_header:
+            w.writeheader()
+        for cg_id in sorted(prices):
+            w.writerow({'date_iso': date_iso, 'cg_id': cg_id, 'usd': prices[cg_id]})
+
+
+def prices_at(ids: t.Iterable[str], when: str, path: pathlib.Path = HISTORY_PATH) -> dict[str, float]:
+    """Latest recorded quote at or before ``when`` (ISO timestamp) for each id."""
+    ids = set(ids)
+    out: dict[str, float] = {}
+    if not path.exists():
+        return out
+    with path.open(newline='') as f:
+        for row in csv.DictReader(f):
+            if row['cg_id'] in ids and row['date_iso'] <= when:
+                out[row['cg_id']] = float(row['usd'])
+    return out
+
+
+_SHARED: PriceCache | None = None
+
+
+def get_prices(ids: t.Iterable[str], fetch: Fetcher = fetch_coingecko) -> dict[str, float]:
+    """Module-level helper backed by one shared ``PriceCache``."""
+    global _SHARED
+    if _SHARED is None:
+        _SHARED = PriceCache()
+    return _SHARED.get_prices(ids, fetch)
@@ -0,0 +1,52 @@
+"""Thread-safe token bucket used to cap outbound request rates."""
+
+from __future__ import annotations
+
+import threading
+import time
+import typing as t
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second with bursts of up to ``burst``.
+
+    ``acquire`` blocks until a token is available, so one bucket can be shared
+    by any number of worker threads to enforce a global budget.  A ``rate`` of
+    zero or less disables limiting.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        clock: t.Callable[[], float] = time.monotonic,
+        sleep: t.Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` from the bucket, sleeping as needed; return seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
@@ -2,25 +2,40 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-
+import openmetrics
+import run_metrics
 import sui_daily_portfolio
 import summarize_latest
 import update_history
 
 
 def main() -> None:
-    """Generate raw data and the Markdown summary for the latest snapshot."""
-
-    # Refresh on-chain data and write data/latest.json plus per-address CSVs.
-    sui_daily_portfolio.main()
-
-    # Build the Markdown report and save it alongside the other data files.
-    report = summarize_latest.build_report()
-    Path("data/latest_report.md").write_text(report)
-
-    # Append this snapshot to historical trend files.
-    update_history.main()
+    """Generate raw data and the Markdown summary for the latest snapshot.
+
+    Stage timings, RPC/HTTP metrics and bytes written are saved to
+    ``data/run_metrics.json``, even when a stage fails.  With
+    ``METRICS_TEXTFILE`` set they are also exported in OpenMetrics format.
+    """
+    out_dir = sui_daily_portfolio.OUT_DIR
+    run = run_metrics.RUN
+    run.reset()
+    try:
+        # Refresh on-chain data and write data/latest.json plus per-address CSVs.
+        with run.stage("collection", out_dir):
+            latest = sui_daily_portfolio.main()
+
+        # Build the Markdown report and save it alongside the other data files.
+        with run.stage("report", out_dir):
+            summarize_latest.render_to_file("data/latest.json", "data/latest_report.md")
+
+        # Append this snapshot to historical trend files under this run's date_iso,
+        # like the per-address CSVs (latest.json keeps its old one when unchanged).
+        with run.stage("history", out_dir):
+            update_history.main(latest)
+    finally:
+        run.write(out_dir / "run_metrics.json")
+        if openmetrics.TEXTFILE:
+            openmetrics.write_textfile(openmetrics.TEXTFILE, out_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+"""Per-run instrumentation written to ``data/run_metrics.json``.
+
+``run_daily_snapshot.main`` wraps each stage in ``RUN.stage(...)`` and the
+collectors open finer ``span``s (per step, and per address where work is
+done per address, e.g. the owned-object walk).  At the end of
+the run ``RUN.write`` stores:
+
+- ``spans``: name (``/``-joined when nested), labels, start offset and
+  duration of every span, plus an ``error`` field when it raised;
+- ``ok`` (no stage raised) and ``last_success_at``, the ``finished_at`` of
+  the newest run that was ``ok``, carried over by failed runs;
+- ``rpc_methods`` / ``hosts``: counts, errors, retries and latency
+  histograms from ``fetch_client.METRICS``;
+- ``files`` / ``bytes_written``: per stage, every file under the output
+  directory that changed.  CSVs here are append-only, so their growth is
+  counted; any other changed file was rewritten and counts in full.
+
+Comparing the file across days shows which stage, address or endpoint got
+slower.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import json
+import os
+import pathlib
+import threading
+import time
+import typing as t
+
+import fetch_client
+
+
+def _utc_now() -> str:
+    return dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat().replace('+00:00', 'Z')
+
+
+def _rounded(stats: dict[str, dict[str, t.Any]]) -> dict[str, dict[str, t.Any]]:
+    return {
+        key: {**s, 'seconds': round(s['seconds'], 6), 'max_seconds': round(s['max_seconds'], 6)}
+        for key, s in sorted(stats.items())
+    }
+
+
+def _file_states(root: pathlib.Path) -> dict[str, tuple[int, int]]:
+    if not root.exists():
+        return {}
+    out = {}
+    for p in root.rglob('*'):
+        if p.is_file():
+            st = p.stat()
+            out[str(p.relative_to(root))] = (st.st_size, st.st_mtime_ns)
+    return out
+
+
+class RunRecorder:
+    """Collects spans and file writes for one pipeline run."""
+
+    def __init__(self, clock: t.Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started_at = _utc_now()
+            self.t0 = self.clock()
+            self.spans: list[dict[str, t.Any]] = []
+            self.files: dict[str, dict[str, dict[str, int]]] = {}
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels: t.Any) -> t.Iterator[None]:
+        """Time the enclosed block; nested spans are named ``outer/inner``."""
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        full = '/'.join(stack + [name])
+        stack.append(name)
+        start = self.clock()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            stack.pop()
+            record: dict[str, t.Any] = {
+                'name': full,
+                'start': round(start - self.t0, 6),
+                'seconds': round(self.clock() - start, 6),
+            }
+            if labels:
+                record['labels'] = labels
+            if error:
+                record['error'] = error
+            with self.lock:
+                self.spans.append(record)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, out_dir: str | pathlib.Path) -> t.Iterator[None]:
+        """A span that also records which files under ``out_dir`` it changed."""
+        root = pathlib.Path(out_dir)
+        before = _file_states(root)
+        try:
+            with self.span(name):
+                yield
+        finally:
+            changed: dict[str, dict[str, int]] = {}
+            for rel, (size, mtime) in _file_states(root).items():
+                old = before.get(rel)
+                if old == (size, mtime):
+                    continue
+                appended = old is not None and rel.endswith('.csv') and size >= old[0]
+                changed[rel] = {'size': size, 'written': size - old[0] if appended else size}
+            with self.lock:
+                self.files[name] = changed
+
+    def to_dict(self) -> dict[str, t.Any]:
+        metrics = fetch_client.METRICS.snapshot()
+        with self.lock:
+            spans = sorted(self.spans, key=lambda s: s['start'])
+            files = {k: dict(v) for k, v in self.files.items()}
+            seconds = self.clock() - self.t0
+        return {
+            'started_at': self.started_at,
+            'finished_at': _utc_now(),
+            # A failed stage re-raises, so its top-level span carries the error.
+            'ok': not any('error' in s for s in spans if '/' not in s['name']),
+            'seconds': round(seconds, 6),
+            'spans': spans,
+            'latency_buckets': list(fetch_client.LATENCY_BUCKETS),
+            'rpc_methods': _rounded(metrics['rpc_methods']),
+            'hosts': _rounded(metrics['hosts']),
+            'files': files,
+            'bytes_written': {
+                stage: sum(f['written'] for f in changed.values()) for stage, changed in files.items()
+            },
+        }
+
+    def write(self, path: str | pathlib.Path) -> None:
+        """Write ``to_dict()`` plus ``last_success_at``, kept from ``path`` when this run failed."""
+        path = pathlib.Path(path)
+        data = self.to_dict()
+        if data['ok']:
+            data['last_success_at'] = data['finished_at']
+        else:
+            try:
+                data['last_success_at'] = json.loads(path.read_text()).get('last_success_at')
+            except (OSError, ValueError, AttributeError):
+                data['last_success_at'] = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, path)
+
+
+RUN = RunRecorder()
+span = RUN.span
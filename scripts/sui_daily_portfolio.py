@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import collections
 import csv
 import datetime as dt
+import functools
+import hashlib
 import json
 import os
 import pathlib
+import sys
 import typing as t
-import urllib.request
-import time
-from urllib.error import URLError
+
+import balance_log
+import fetch_client
+import latest_writer
+import price_cache
+from coin_metadata_cache import CoinMetadataCache
+from run_metrics import span
+from sui_rpc import fetch_coin_metadata, iter_multi_get_objects, iter_owned_objects, rpc, rpc_batch
 
 RPC_URL = os.environ.get('SUI_RPC_URL', 'https://fullnode.mainnet.sui.io:443')
 ADDRS_ENV = os.environ.get('SUI_ADDRESSES') or os.environ.get('SUI_ADDRESS') or ''
@@ -23,36 +32,104 @@ seen: set[str] = set()
 ADDRESSES = [a for a in ADDRESSES if not (a in seen or seen.add(a))]
 
 OUT_DIR = pathlib.Path(os.environ.get('OUT_DIR', 'data'))
+# 'full' appends every balance to portfolio_<prefix>.csv; 'delta' appends only
+# changes to balances_<prefix>.csv (see balance_log.py).
+BALANCE_LOG = os.environ.get('BALANCE_LOG', 'full')
+# With SUI_INCREMENTAL=1 addresses whose latest transaction digests match the
+# previous latest.json reuse its balances instead of being refetched.
+INCREMENTAL = os.environ.get('SUI_INCREMENTAL', '0').lower() in ('1', 'true', 'yes')
+# With SUI_OBJECTS=1 each account also gets an 'objects' section listing
+# non-coin objects (staked SUI, LP positions, receipts...), at most
+# SUI_OBJECTS_MAX_ITEMS of them with their fields; the rest are only counted.
+FETCH_OBJECTS = os.environ.get('SUI_OBJECTS', '0').lower() in ('1', 'true', 'yes')
+OBJECTS_MAX_ITEMS = int(os.environ.get('SUI_OBJECTS_MAX_ITEMS', 1000))
 
 # ---- JSON-RPC ----
 
-def _rpc_once(method: str, params: t.List[t.Any]) -> t.Any:
-    payload = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}).encode('utf-8')
-    req = urllib.request.Request(RPC_URL, data=payload, headers={'Content-Type': 'application/json'})
-    with urllib.request.urlopen(req, timeout=30) as r:  # stdlib only
-        body = r.read().decode('utf-8')
-    data = json.loads(body)
-    if 'error' in data:
-        raise RuntimeError(f"RPC error {data['error']}")
-    return data['result']
+def get_all_balances(address: str) -> t.List[dict]:
+    return rpc('suix_getAllBalances', [address], url=RPC_URL)
 
 
-def rpc(method: str, params: t.List[t.Any], retries: int = 3, backoff: float = 1.0) -> t.Any:
-    for attempt in range(retries):
-        try:
-            return _rpc_once(method, params)
-        except Exception:
-            if attempt == retries - 1:
-                raise
-            time.sleep(backoff * (2 ** attempt))
+def get_coin_metadata(coin_type: str) -> dict:
+    return rpc('suix_getCoinMetadata', [coin_type], url=RPC_URL) or {}
 
 
-def get_all_balances(address: str) -> t.List[dict]:
-    return rpc('suix_getAllBalances', [address])
+def get_all_balances_many(addresses: t.List[str]) -> t.List[t.List[dict]]:
+    return rpc_batch([('suix_getAllBalances', [a]) for a in addresses], url=RPC_URL)
 
 
-def get_coin_metadata(coin_type: str) -> dict:
-    return rpc('suix_getCoinMetadata', [coin_type]) or {}
+def get_last_tx_many(addresses: t.List[str]) -> t.Dict[str, dict]:
+    """Digest of the newest transaction sent from and sent to each address.
+
+    Two ``suix_queryTransactionBlocks`` calls (limit 1, descending) per address,
+    all in one batch.  Addresses whose query failed are left out, so callers
+    treat them as active.
+    """
+    calls = [
+        ('suix_queryTransactionBlocks', [{'filter': {kind: a}}, None, 1, True])
+        for a in addresses
+        for kind in ('FromAddress', 'ToAddress')
+    ]
+    results = rpc_batch(calls, url=RPC_URL, return_exceptions=True)
+    heads: t.Dict[str, dict] = {}
+    for i, a in enumerate(addresses):
+        sent, received = results[2 * i], results[2 * i + 1]
+        if isinstance(sent, Exception) or isinstance(received, Exception):
+            continue
+        heads[a] = {
+            'from': ((sent or {}).get('data') or [{}])[0].get('digest'),
+            'to': ((received or {}).get('data') or [{}])[0].get('digest'),
+        }
+    return heads
+
+
+def get_owned_objects(address: str, max_items: int = OBJECTS_MAX_ITEMS) -> dict:
+    """Summary of everything ``address`` owns besides ``Coin<T>`` objects.
+
+    Walks ``suix_getOwnedObjects`` page by page and fetches the contents of
+    the first ``max_items`` non-coin objects with ``sui_multiGetObjects``, so
+    memory stays bounded by the page size plus ``max_items``.
+    """
+    by_type: collections.Counter[str] = collections.Counter()
+    counts = {'total': 0, 'non_coin': 0, 'listed': 0}
+
+    def non_coin_ids() -> t.Iterator[str]:
+        for obj in iter_owned_objects(address, url=RPC_URL):
+            obj_type = obj.get('type') or ''
+            counts['total'] += 1
+            by_type[obj_type] += 1
+            if obj_type.startswith('0x2::coin::Coin<'):
+                continue
+            counts['non_coin'] += 1
+            if counts['listed'] >= max_items:
+                continue
+            counts['listed'] += 1
+            yield obj['objectId']
+
+    items = []
+    for obj in iter_multi_get_objects(non_coin_ids(), url=RPC_URL):
+        content = obj.get('content') or {}
+        items.append({
+            'object_id': obj.get('objectId'),
+            'type': obj.get('type') or content.get('type'),
+            'version': obj.get('version'),
+            'fields': content.get('fields'),
+        })
+    return {
+        'total': counts['total'],
+        'by_type': dict(sorted(by_type.items())),
+        'items': items,
+        'truncated': counts['non_coin'] > counts['listed'],
+    }
+
+
+def load_previous_accounts(path: pathlib.Path) -> t.Dict[str, dict]:
+    """Accounts of the previous ``latest.json`` keyed by address."""
+    try:
+        prev = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return {acc['address']: acc for acc in prev.get('accounts') or [] if acc.get('address')}
 
 # ---- Pricing (CoinGecko) ----
 
@@ -68,17 +145,10 @@ CG_IDS = {
 
 
 def fetch_prices_cg(ids: t.Set[str]) -> dict:
+    # Cached for PRICE_TTL seconds; stale quotes are served if CoinGecko is down.
     if not ids:
         return {}
-    q = ','.join(sorted(ids))
-    url = f'https://api.coingecko.com/api/v3/simple/price?ids={q}&vs_currencies=usd'
-    req = urllib.request.Request(url, headers={'Accept': 'application/json', 'User-Agent': 'portfolio-bot/1.0'})
-    try:
-        with urllib.request.urlopen(req, timeout=20) as r:
-            data = json.loads(r.read().decode('utf-8'))
-            return {k: float(v.get('usd', 0)) for k, v in data.items()}
-    except URLError:
-        return {}
+    return price_cache.get_prices(ids)
 
 
 def symbol_to_cg_id(sym: str) -> str | None:
@@ -101,25 +171,117 @@ def addr_prefix(addr: str) -> str:
 
 # ---- main ----
 
-def main() -> None:
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-
+CSV_HEADER = ['date_iso', 'address', 'coin_type', 'symbol', 'decimals', 'raw_balance', 'human_balance']
+
+
+def write_balance_rows(addr: str, date_iso: str, rows_csv: t.List[dict]) -> None:
+    """Append one snapshot of ``addr`` to its per-address CSV or delta log."""
+    if BALANCE_LOG == 'delta':
+        balance_log.append_snapshot(OUT_DIR / f'balances_{addr_prefix(addr)}.csv', date_iso, rows_csv)
+        return
+    csv_path = OUT_DIR / f'portfolio_{addr_prefix(addr)}.csv'
+    write_header = not csv_path.exists()
+    with csv_path.open('a', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=CSV_HEADER)
+        if write_header:
+            w.writeheader()
+        for r in rows_csv:
+            w.writerow(r)
+
+
+def snapshot_fingerprint(latest: dict) -> str:
+    """Hash of a snapshot's content, ignoring timestamps and transaction digests."""
+    content = {
+        'accounts': [
+            {k: v for k, v in acc.items() if k not in ('date_iso', 'last_tx')}
+            for acc in latest.get('accounts') or []
+        ],
+        'prices_usd': latest.get('prices_usd'),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def collect(
+    meta_cache: CoinMetadataCache | None = None,
+    previous: t.Dict[str, dict] | None = None,
+    incremental: bool = INCREMENTAL,
+    refresh: t.Collection[str] | None = None,
+) -> t.Tuple[dict, t.Dict[str, t.List[dict]]]:
+    """Fetch and value all ``ADDRESSES`` without writing snapshot files.
+
+    Returns the ``latest.json`` payload and the CSV rows per address for
+    ``persist``.  Long-running callers pass their own ``meta_cache`` and the
+    accounts of their last snapshot as ``previous`` (by default read from
+    ``latest.json`` in incremental mode).  With ``refresh``, only those
+    addresses are refetched and every other address found in ``previous``
+    is reused without change detection (used by event-driven refreshes);
+    ``last_tx`` is re-read for the refreshed addresses and carried over for
+    the reused ones.
+    """
     # 1) Pull wallet balances for all addresses
     accounts: list[dict] = []
+    rows_by_address: t.Dict[str, t.List[dict]] = {}
     symbols_needed: set[str] = set()
-
+    if meta_cache is None:
+        meta_cache = CoinMetadataCache()
+
+    # Incremental mode: idle addresses (same newest transactions as last run)
+    # reuse the balances, symbols and decimals recorded in the previous snapshot.
+    heads: t.Dict[str, dict] = {}
+    reused: t.Dict[str, dict] = {}
+    if refresh is not None:
+        reused = {a: previous[a] for a in ADDRESSES if a not in refresh and a in (previous or {})}
+        # Record the heads of the refreshed addresses (before their balances, so a
+        # transaction landing in between only costs a refetch) for the next incremental run.
+        refreshed = [a for a in ADDRESSES if a not in reused]
+        if refreshed:
+            with span('change_detection'):
+                heads = get_last_tx_many(refreshed)
+    elif incremental:
+        if previous is None:
+            previous = load_previous_accounts(OUT_DIR / 'latest.json')
+        with span('change_detection'):
+            heads = get_last_tx_many(ADDRESSES)
+        reused = {
+            a: previous[a]
+            for a in ADDRESSES
+            if a in previous and a in heads and previous[a].get('last_tx') == heads[a]
+        }
+        print(f'incremental: {len(ADDRESSES) - len(reused)} of {len(ADDRESSES)} addresses active', file=sys.stderr)
+    active = [a for a in ADDRESSES if a not in reused]
+
+    # One batched round trip for every active address, then one for every unknown coin type.
+    # Results keep ADDRESSES order even when SUI_RPC_WORKERS sends batches in parallel.
+    with span('balances', addresses=len(active)):
+        fetched = dict(zip(active, get_all_balances_many(active))) if active else {}
+    date_iso = dt.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
+    with span('metadata'):
+        metas = meta_cache.resolve(
+            [b.get('coinType') for balances in fetched.values() for b in balances],
+            functools.partial(fetch_coin_metadata, url=RPC_URL),
+        )
+        meta_cache.save()
+    all_balances = []
     for addr in ADDRESSES:
-        csv_path = OUT_DIR / f'portfolio_{addr_prefix(addr)}.csv'
-        balances = get_all_balances(addr)
+        if addr in fetched:
+            all_balances.append(fetched[addr])
+            continue
+        all_balances.append([
+            {'coinType': r['coin_type'], 'totalBalance': str(r['raw_balance'])}
+            for r in reused[addr].get('balances') or []
+        ])
+        for r in reused[addr].get('balances') or []:
+            metas.setdefault(r['coin_type'], {'symbol': r['symbol'], 'decimals': r['decimals']})
+
+    for addr, balances in zip(ADDRESSES, all_balances):
         balances = sorted(balances, key=lambda b: b.get('coinType', ''))
-        date_iso = dt.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
 
         rows_csv: list[dict] = []
         rows_json: list[dict] = []
         for b in balances:
             coin_type = b.get('coinType')
             raw = int(b.get('totalBalance', '0') or 0)
-            meta = get_coin_metadata(coin_type)
+            meta = metas.get(coin_type) or {}
             symbol = meta.get('symbol') or ''
             decimals = int(meta.get('decimals') or 9)
             human = raw / (10 ** decimals)
@@ -141,17 +303,8 @@ def main() -> None:
             })
             if symbol:
                 symbols_needed.add(symbol)
-            time.sleep(0.02)
-
-        # write CSV per address
-        header = ['date_iso', 'address', 'coin_type', 'symbol', 'decimals', 'raw_balance', 'human_balance']
-        write_header = not csv_path.exists()
-        with csv_path.open('a', newline='') as f:
-            w = csv.DictWriter(f, fieldnames=header)
-            if write_header:
-                w.writeheader()
-            for r in rows_csv:
-                w.writerow(r)
+
+        rows_by_address[addr] = rows_csv
 
         # Suilend attachment path for this address
         suilend_path = OUT_DIR / f'suilend_{addr_prefix(addr)}.json'
@@ -170,16 +323,31 @@ def main() -> None:
             except Exception as e:
                 suilend_obj = {'error': str(e)}
 
-        accounts.append({
+        account = {
             'address': addr,
             'date_iso': date_iso,
             'balances': rows_json,
             'defi': {'suilend': suilend_obj},
-        })
+        }
+        if addr in heads:
+            account['last_tx'] = heads[addr]
+        elif addr in reused and 'last_tx' in reused[addr]:
+            account['last_tx'] = reused[addr]['last_tx']
+        if FETCH_OBJECTS:
+            if addr in reused and 'objects' in reused[addr]:
+                account['objects'] = reused[addr]['objects']
+            else:
+                try:
+                    with span('objects', address=addr_prefix(addr)):
+                        account['objects'] = get_owned_objects(addr)
+                except Exception as e:
+                    account['objects'] = {'error': str(e)}
+        accounts.append(account)
 
     # 2) Fetch prices
     cg_ids = {cid for sym in symbols_needed if (cid := symbol_to_cg_id(sym))}
-    prices = fetch_prices_cg(cg_ids)
+    with span('prices'):
+        prices = fetch_prices_cg(cg_ids)
 
     # 3) Compute USD fields + totals per account
     grand_total_wallet_usd = 0.0
@@ -236,7 +404,7 @@ def main() -> None:
         acc.setdefault('defi', {})['suilend_summary'] = suilend_summary
         grand_total_suilend_net_usd += (deposits_usd - borrows_usd)
 
-    # 4) Write latest.json with totals
+    # 4) Assemble latest.json with totals
     now_iso = dt.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
     latest = {
         'date_iso': now_iso,
@@ -249,7 +417,33 @@ def main() -> None:
         },
     }
 
-    (OUT_DIR / 'latest.json').write_text(json.dumps(latest, indent=2))
+    return latest, rows_by_address
+
+
+def persist(latest: dict, rows_by_address: t.Dict[str, t.List[dict]]) -> dict | None:
+    """Append the per-address CSV rows and write ``latest.json`` (see ``latest_writer``).
+
+    Returns the diff against the previous ``latest.json``, or ``None`` when
+    only timestamps changed and the file was left alone.
+    """
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    for acc in latest['accounts']:
+        write_balance_rows(acc['address'], acc['date_iso'], rows_by_address.get(acc['address'], []))
+    changes = latest_writer.write_latest(latest, OUT_DIR / 'latest.json')
+    if changes is None:
+        print('latest.json: unchanged apart from timestamps, not rewritten', file=sys.stderr)
+    else:
+        print(f"latest.json: {len(changes['changes'])} change(s), see latest_diff.json", file=sys.stderr)
+    return changes
+
+
+def main() -> dict:
+    """Collect and persist one snapshot; return it (with this run's ``date_iso``)."""
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    latest, rows_by_address = collect()
+    persist(latest, rows_by_address)
+    fetch_client.report_stats()
+    return latest
 
 
 if __name__ == '__main__':
@@ -0,0 +1,247 @@
+"""JSON-RPC batch helpers for the Sui fullnode.
+
+``rpc_batch`` packs many calls into JSON-RPC batch arrays (``SUI_RPC_BATCH_SIZE``
+calls per HTTP POST, default 50), correlates the responses by ``id`` and
+retries only the elements that failed, with the jittered backoff of
+``fetch_client``.  Results come back in the same order as the calls.  ``rpc``
+is the single-call form every script uses instead of its own helper.
+
+Batches can be sent concurrently from ``SUI_RPC_WORKERS`` threads (default 1,
+i.e. serial).  All threads share one token bucket that allows
+``SUI_RPC_RATE`` HTTP requests per second (bursts of ``SUI_RPC_BURST``), so
+raising the worker count never exceeds the fullnode budget.
+
+``iter_owned_objects`` and ``iter_multi_get_objects`` are generators over
+paginated object queries; they hold one page at a time, so wallets with tens
+of thousands of objects can be walked in constant memory.
+"""
+
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import itertools
+import os
+import time
+import typing as t
+
+import fetch_client
+import http_archive
+from rate_limit import TokenBucket
+
+RPC_URL = os.environ.get('SUI_RPC_URL', 'https://fullnode.mainnet.sui.io:443')
+BATCH_SIZE = int(os.environ.get('SUI_RPC_BATCH_SIZE', 50))
+WORKERS = int(os.environ.get('SUI_RPC_WORKERS', 1))
+LIMITER = TokenBucket(
+    float(os.environ.get('SUI_RPC_RATE', 10)),
+    float(os.environ.get('SUI_RPC_BURST', 10)),
+)
+
+# Largest page the fullnode accepts for suix_getOwnedObjects / sui_multiGetObjects.
+OBJECT_PAGE_SIZE = 50
+
+Call = t.Tuple[str, t.List[t.Any]]
+
+# JSON-RPC error codes the fullnode returns again for the same call (parse
+# error, invalid request, unknown method, invalid params); never retried.
+PERMANENT_CODES = frozenset({-32700, -32600, -32601, -32602})
+
+
+class RpcError(RuntimeError):
+    """A single call in a batch failed (RPC error, missing response or transport error).
+
+    ``code`` is the JSON-RPC error code when the fullnode answered the call
+    with an error object, else ``None``.
+    """
+
+    def __init__(self, message: str, code: int | None = None) -> None:
+        super().__init__(message)
+        self.code = code
+
+    @property
+    def permanent(self) -> bool:
+        """Whether the same call would fail the same way again."""
+        return self.code in PERMANENT_CODES
+
+
+def _post_batch(url: str, payload: list[dict], timeout: float) -> list[dict]:
+    # One attempt: rpc_batch retries the failed elements itself.
+    body = fetch_client.post_json(url, payload, timeout=timeout, retries=1)
+    # Some servers answer a batch with a single error object.
+    if isinstance(body, dict):
+        raise RpcError(f"RPC batch rejected: {body.get('error', body)}")
+    return body
+
+
+def _chunks(seq: list[int], size: int) -> t.Iterator[list[int]]:
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _send_chunk(
+    calls: t.Sequence[Call],
+    chunk: list[int],
+    url: str,
+    timeout: float,
+    limiter: TokenBucket | None,
+) -> tuple[dict[int, t.Any], dict[int, Exception]]:
+    """POST one batch; return ``(results, errors)`` keyed by call index."""
+    payload = [
+        {'jsonrpc': '2.0', 'id': i, 'method': calls[i][0], 'params': calls[i][1]}
+        for i in chunk
+    ]
+    if limiter is not None and not http_archive.replaying():
+        limiter.acquire()
+    start = time.perf_counter()
+    results: dict[int, t.Any] = {}
+    errors: dict[int, Exception] = {}
+    try:
+        responses = _post_batch(url, payload, timeout)
+    except Exception as e:  # noqa: BLE001 - whole chunk failed, retry all of it
+        errors = {i: e for i in chunk}
+    else:
+        by_id = {r.get('id'): r for r in responses if isinstance(r, dict)}
+        for i in chunk:
+            resp = by_id.get(i)
+            if resp is None:
+                errors[i] = RpcError(f'no response for {calls[i][0]} (id {i})')
+            elif 'error' in resp:
+                error = resp['error']
+                code = error.get('code') if isinstance(error, dict) else None
+                errors[i] = RpcError(f'RPC error {error}', code if isinstance(code, int) else None)
+            else:
+                results[i] = resp.get('result')
+    _record_methods(calls, chunk, errors, time.perf_counter() - start)
+    return results, errors
+
+
+def _record_methods(calls: t.Sequence[Call], chunk: list[int], errors: dict[int, Exception], seconds: float) -> None:
+    per_method = collections.Counter(calls[i][0] for i in chunk)
+    failed = collections.Counter(calls[i][0] for i in errors)
+    for method, n in per_method.items():
+        fetch_client.METRICS.record_rpc(method, seconds, n, failed[method])
+
+
+def rpc_batch(
+    calls: t.Sequence[Call],
+    url: str = RPC_URL,
+    batch_size: int = BATCH_SIZE,
+    retries: int = 3,
+    backoff: float = 1.0,
+    timeout: float = 30,
+    return_exceptions: bool = False,
+    workers: int = WORKERS,
+    limiter: TokenBucket | None = LIMITER,
+) -> list[t.Any]:
+    """Run ``calls`` (``(method, params)`` pairs) as JSON-RPC batches.
+
+    Each call gets its index as its JSON-RPC ``id``.  Calls whose response is
+    missing, carries an ``error`` or whose HTTP request failed are re-sent in
+    the next attempt, except for ``RpcError.permanent`` errors; successful
+    ones are never repeated.  After ``retries`` attempts the remaining
+    failures (permanent ones included) are raised as ``RpcError`` (the first
+    one), or placed in the result list when ``return_exceptions`` is true.
+
+    With ``workers > 1`` the batches of one attempt are sent from a thread
+    pool; every POST first takes a token from ``limiter``.
+    """
+    results: list[t.Any] = [None] * len(calls)
+    errors: dict[int, Exception] = {}
+    pending = list(range(len(calls)))
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for attempt in range(retries):
+            if attempt:
+                for method, n in collections.Counter(calls[i][0] for i in pending).items():
+                    fetch_client.METRICS.retry_rpc(method, n)
+                fetch_client.sleep_backoff(attempt - 1, backoff)
+            chunks = list(_chunks(pending, max(1, batch_size)))
+            if pool is not None and len(chunks) > 1:
+                outcomes = pool.map(lambda c: _send_chunk(calls, c, url, timeout, limiter), chunks)
+            else:
+                outcomes = (_send_chunk(calls, c, url, timeout, limiter) for c in chunks)
+            # ``errors`` spans attempts: permanent failures from earlier attempts
+            # are not resent and must still be reported.
+            for ok, failed in outcomes:
+                for i, value in ok.items():
+                    results[i] = value
+                    errors.pop(i, None)
+                errors.update(failed)
+            pending = sorted(i for i, e in errors.items() if not (isinstance(e, RpcError) and e.permanent))
+            if not pending:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    for i in sorted(errors):
+        e = errors[i] if isinstance(errors[i], RpcError) else RpcError(str(errors[i]))
+        if not return_exceptions:
+            raise e
+        results[i] = e
+    return results
+
+
+def rpc(method: str, params: t.List[t.Any], url: str = RPC_URL, **kwargs: t.Any) -> t.Any:
+    """Run one JSON-RPC call; raise ``RpcError`` once its retries are exhausted."""
+    return rpc_batch([(method, params)], url=url, **kwargs)[0]
+
+
+def fetch_coin_metadata(coin_types: t.Sequence[str], url: str = RPC_URL) -> dict[str, dict | None]:
+    """Batch fetcher for ``CoinMetadataCache.resolve`` (``suix_getCoinMetadata``).
+
+    Coin types the fullnode rejects (``RpcError.permanent``) map to ``None``,
+    so the cache stores them as having no metadata; other failures are left
+    out so they are retried on the next run.
+    """
+    metas = rpc_batch([('suix_getCoinMetadata', [ct]) for ct in coin_types], url=url, return_exceptions=True)
+    return {
+        ct: None if isinstance(m, RpcError) else m
+        for ct, m in zip(coin_types, metas)
+        if not isinstance(m, RpcError) or m.permanent
+    }
+
+
+def iter_owned_objects(
+    address: str,
+    url: str = RPC_URL,
+    page_size: int = OBJECT_PAGE_SIZE,
+    options: dict | None = None,
+) -> t.Iterator[dict]:
+    """Yield the object data of every object owned by ``address``.
+
+    Follows ``nextCursor`` one ``suix_getOwnedObjects`` page at a time.  By
+    default only ``objectId``, ``version``, ``digest`` and ``type`` are
+    requested; pass ``options`` to ask for more.
+    """
+    query = {'options': options if options is not None else {'showType': True}}
+    cursor = None
+    while True:
+        page = rpc_batch([('suix_getOwnedObjects', [address, query, cursor, page_size])], url=url)[0] or {}
+        for item in page.get('data') or []:
+            if item.get('data'):
+                yield item['data']
+        cursor = page.get('nextCursor')
+        if not page.get('hasNextPage') or not cursor:
+            return
+
+
+def iter_multi_get_objects(
+    object_ids: t.Iterable[str],
+    url: str = RPC_URL,
+    chunk_size: int = OBJECT_PAGE_SIZE,
+    options: dict | None = None,
+) -> t.Iterator[dict]:
+    """Yield object data for ``object_ids`` using ``sui_multiGetObjects`` chunks.
+
+    ``object_ids`` may be a generator; at most ``chunk_size`` ids are buffered.
+    Objects that no longer exist (deleted or transferred) are skipped.
+    """
+    opts = options if options is not None else {'showType': True, 'showContent': True}
+    ids = iter(object_ids)
+    while True:
+        chunk = list(itertools.islice(ids, chunk_size))
+        if not chunk:
+            return
+        for item in rpc_batch([('sui_multiGetObjects', [chunk, opts])], url=url)[0] or []:
+            if item.get('data'):
+                yield item['data']
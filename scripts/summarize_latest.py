@@ -1,10 +1,31 @@
+"""Render the Markdown (or HTML) report for ``data/latest.json``.
+
+The report is streamed to its output one account section at a time.  With a
+section cache (``--cache``, or ``REPORT_CACHE`` in the environment) each
+rendered section is stored under a hash of the account data it shows, so
+only accounts whose balances or Suilend positions changed are re-rendered.
+Markdown and HTML sections share the cache.  It is off by default: a cold
+cache is slower than none, which is what a fresh CI checkout always has, so
+only long-running callers such as ``portfolio_daemon`` use it unasked.
+"""
+
 from __future__ import annotations
 
 import argparse
-from collections import defaultdict
+import hashlib
+from html import escape
+import io
 import json
+import os
 from pathlib import Path
+import shutil
+import sqlite3
 import sys
+from typing import TextIO
+
+CACHE_PATH = Path(os.environ["REPORT_CACHE"]) if os.environ.get("REPORT_CACHE") else None
+# Bump when the section layout changes so cached sections are not reused.
+SECTION_VERSION = 1
 
 
 def fmt_money(x: float | None) -> str:
@@ -25,72 +46,143 @@ def load_json(path: str | Path) -> dict:
         return {}
 
 
-def build_report(latest_json_path: str | Path = 'data/latest.json') -> str:
-    data = load_json(latest_json_path)
-    if not data:
-        return "# Portfolio report Latest file not found."
+def account_key(acc: dict, fmt: str) -> str:
+    """Cache key of an account section: a hash of exactly the values the section shows.
+
+    Zero balances and fields the report does not render (dates, raw Suilend
+    data) are left out, so they neither cost hashing time nor invalidate it.
+    """
+    ss = _suilend(acc)
+    content = (
+        fmt,
+        SECTION_VERSION,
+        acc.get('address', '-'),
+        [
+            (b.get('symbol', ''), b.get('human_balance'), b.get('usd_price'), b.get('usd_value'))
+            for b in acc.get('balances', [])
+            if (b.get('human_balance') or 0) > 0
+        ],
+        (acc.get('totals') or {}).get('wallet_usd'),
+        [
+            (it.get('kind', ''), it.get('symbol', ''), it.get('amount'), it.get('usd_price'), it.get('usd_value'))
+            for it in ss.get('items') or []
+        ],
+        ss.get('deposits_usd'),
+        ss.get('borrows_usd'),
+        ss.get('net_usd'),
+    )
+    return hashlib.sha256(repr(content).encode('utf-8')).hexdigest()
+
+
+def _wallet_rows(acc: dict) -> list[dict]:
+    rows = [b for b in acc.get('balances', []) if (b.get('human_balance') or 0) > 0]
+    # sort by usd_value desc (unpriced last)
+    rows.sort(key=lambda b: (b.get('usd_value') is None, -(b.get('usd_value') or 0)))
+    return rows
+
+
+def _suilend(acc: dict) -> dict:
+    return (acc.get('defi') or {}).get('suilend_summary') or {}
+
+
+def render_account_markdown(acc: dict) -> str:
+    addr = acc.get('address', '-')
+    wallet_rows = _wallet_rows(acc)
+    wallet_total_usd = float((acc.get('totals') or {}).get('wallet_usd') or 0)
+    ss = _suilend(acc)
+
+    lines = []
+    lines.append(f"## Address {addr}")
+    lines.append("")
+    if wallet_rows:
+        lines.append("### Wallet (non-zero)")
+        lines.append("| Symbol | Balance | USD price | USD value |")
+        lines.append("|---|---:|---:|---:|")
+        for b in wallet_rows:
+            lines.append(
+                f"| {b.get('symbol','')} | {fmt_num(b.get('human_balance'))} | "
+                f"{fmt_num(b.get('usd_price'))} | {fmt_money(b.get('usd_value'))} |"
+            )
+        lines.append("")
+        lines.append(f"**Wallet total (USD):** {fmt_money(wallet_total_usd)}")
+        lines.append("")
 
-    date_iso = data.get('date_iso', '-')
+    if ss.get('items'):
+        lines.append("### Suilend")
+        lines.append("| Type | Symbol | Amount | USD price | USD value |")
+        lines.append("|---|---|---:|---:|---:|")
+        for it in ss['items']:
+            lines.append(
+                f"| {it.get('kind','')} | {it.get('symbol','')} | {fmt_num(it.get('amount'))} | "
+                f"{fmt_num(it.get('usd_price'))} | {fmt_money(it.get('usd_value'))} |"
+            )
+        lines.append("")
+        lines.append(f"**Deposits:** {fmt_money(float(ss.get('deposits_usd') or 0))}  ")
+        lines.append(f"**Borrows:** {fmt_money(float(ss.get('borrows_usd') or 0))}  ")
+        lines.append(f"**Net:** {fmt_money(float(ss.get('net_usd') or 0))}")
+        lines.append("")
 
-    # Totals from latest.json
+    # Trailing blank line to keep spacing consistent when joined later
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _html_table(headers: list[str], rows: list[list[str]], numeric_from: int) -> list[str]:
+    out = ["<table>", "<tr>" + "".join(f"<th>{escape(h)}</th>" for h in headers) + "</tr>"]
+    for row in rows:
+        cells = "".join(
+            f'<td class="num">{escape(c)}</td>' if i >= numeric_from else f"<td>{escape(c)}</td>"
+            for i, c in enumerate(row)
+        )
+        out.append(f"<tr>{cells}</tr>")
+    out.append("</table>")
+    return out
+
+
+def render_account_html(acc: dict) -> str:
+    addr = acc.get('address', '-')
+    wallet_rows = _wallet_rows(acc)
+    wallet_total_usd = float((acc.get('totals') or {}).get('wallet_usd') or 0)
+    ss = _suilend(acc)
+
+    lines = ["<section>", f"<h2>Address {escape(addr)}</h2>"]
+    if wallet_rows:
+        lines.append("<h3>Wallet (non-zero)</h3>")
+        lines += _html_table(
+            ["Symbol", "Balance", "USD price", "USD value"],
+            [
+                [str(b.get('symbol', '')), fmt_num(b.get('human_balance')),
+                 fmt_num(b.get('usd_price')), fmt_money(b.get('usd_value'))]
+                for b in wallet_rows
+            ],
+            numeric_from=1,
+        )
+        lines.append(f"<p><strong>Wallet total (USD):</strong> {escape(fmt_money(wallet_total_usd))}</p>")
+    if ss.get('items'):
+        lines.append("<h3>Suilend</h3>")
+        lines += _html_table(
+            ["Type", "Symbol", "Amount", "USD price", "USD value"],
+            [
+                [str(it.get('kind', '')), str(it.get('symbol', '')), fmt_num(it.get('amount')),
+                 fmt_num(it.get('usd_price')), fmt_money(it.get('usd_value'))]
+                for it in ss['items']
+            ],
+            numeric_from=2,
+        )
+        lines.append(
+            f"<p><strong>Deposits:</strong> {escape(fmt_money(float(ss.get('deposits_usd') or 0)))}<br>"
+            f"<strong>Borrows:</strong> {escape(fmt_money(float(ss.get('borrows_usd') or 0)))}<br>"
+            f"<strong>Net:</strong> {escape(fmt_money(float(ss.get('net_usd') or 0)))}</p>"
+        )
+    lines.append("</section>")
+    return "\n".join(lines) + "\n"
+
+
+def _totals(data: dict) -> dict[str, float]:
+    """Header figures; the Suilend net is summed over all accounts."""
     totals = data.get('totals_usd') or {}
     wallet_sum = float(totals.get('wallet_sum') or 0)
-
-    # Aggregate Suilend net across accounts
-    lending_totals = defaultdict(float)
-    per_account_sections: list[str] = []
-
-    for acc in data.get('accounts', []):
-        addr = acc.get('address', '-')
-
-        # Wallet table
-        wallet_rows = [b for b in acc.get('balances', []) if (b.get('human_balance') or 0) > 0]
-        # sort by usd_value desc (unpriced last)
-        wallet_rows.sort(key=lambda b: (b.get('usd_value') is None, -(b.get('usd_value') or 0)))
-        wallet_total_usd = float((acc.get('totals') or {}).get('wallet_usd') or 0)
-
-        # Suilend summary (already USD)
-        ss = (acc.get('defi') or {}).get('suilend_summary') or {}
-        suilend_deposits = float(ss.get('deposits_usd') or 0)
-        suilend_borrows = float(ss.get('borrows_usd') or 0)
-        suilend_net = float(ss.get('net_usd') or 0)
-        lending_totals['Suilend'] += suilend_net
-
-        # Account section
-        lines = []
-        lines.append(f"## Address {addr}")
-        lines.append("")
-        if wallet_rows:
-            lines.append("### Wallet (non-zero)")
-            lines.append("| Symbol | Balance | USD price | USD value |")
-            lines.append("|---|---:|---:|---:|")
-            for b in wallet_rows:
-                lines.append(
-                    f"| {b.get('symbol','')} | {fmt_num(b.get('human_balance'))} | "
-                    f"{fmt_num(b.get('usd_price'))} | {fmt_money(b.get('usd_value'))} |"
-                )
-            lines.append("")
-            lines.append(f"**Wallet total (USD):** {fmt_money(wallet_total_usd)}")
-            lines.append("")
-
-        if ss.get('items'):
-            lines.append("### Suilend")
-            lines.append("| Type | Symbol | Amount | USD price | USD value |")
-            lines.append("|---|---|---:|---:|---:|")
-            for it in ss['items']:
-                lines.append(
-                    f"| {it.get('kind','')} | {it.get('symbol','')} | {fmt_num(it.get('amount'))} | "
-                    f"{fmt_num(it.get('usd_price'))} | {fmt_money(it.get('usd_value'))} |"
-                )
-            lines.append("")
-            lines.append(f"**Deposits:** {fmt_money(suilend_deposits)}  ")
-            lines.append(f"**Borrows:** {fmt_money(suilend_borrows)}  ")
-            lines.append(f"**Net:** {fmt_money(suilend_net)}")
-            lines.append("")
-
-        # Trailing blank line to keep spacing consistent when joined later
-        lines.append("")
-        per_account_sections.append("\n".join(lines))
+    suilend = sum(float(_suilend(acc).get('net_usd') or 0) for acc in data.get('accounts', []))
 
     # Optional: Other protocols (placeholders until fetchers added)
     # If in the future we write data/scallop_*.json, data/navi_*.json, we can parse here.
@@ -99,39 +191,207 @@ def build_report(latest_json_path: str | Path = 'data/latest.json') -> str:
     vaults_aftermath = 0.0
     vaults_cetus = 0.0
 
-    lending_total = lending_totals.get('Suilend', 0.0) + scallop_total + navi_total
-    portfolio_total = wallet_sum + lending_total + vaults_aftermath + vaults_cetus
-
-    # Header
+    lending_total = suilend + scallop_total + navi_total
+    return {
+        'wallet': wallet_sum,
+        'suilend': suilend,
+        'scallop': scallop_total,
+        'navi': navi_total,
+        'lending': lending_total,
+        'aftermath': vaults_aftermath,
+        'cetus': vaults_cetus,
+        'vaults': vaults_aftermath + vaults_cetus,
+        'portfolio': wallet_sum + lending_total + vaults_aftermath + vaults_cetus,
+    }
+
+
+def render_header_markdown(data: dict) -> str:
+    t = _totals(data)
     head: list[str] = []
     head.append("# Portfolio report")
     head.append("")
-    head.append(f"**As of:** {date_iso}  ")
+    head.append(f"**As of:** {data.get('date_iso', '-')}  ")
     head.append(
-        f"**Totals (USD):** wallet={fmt_money(wallet_sum)}, "
-        f"lending={fmt_money(lending_total)}, vaults={fmt_money(vaults_aftermath + vaults_cetus)}, "
-        f"**portfolio={fmt_money(portfolio_total)}**"
+        f"**Totals (USD):** wallet={fmt_money(t['wallet'])}, "
+        f"lending={fmt_money(t['lending'])}, vaults={fmt_money(t['vaults'])}, "
+        f"**portfolio={fmt_money(t['portfolio'])}**"
     )
     head.append("")
 
     # Protocol summary like your screenshot
     head.append("## Lending")
-    head.append(f"- Suilend — {fmt_money(lending_totals.get('Suilend', 0.0))}")
-    head.append(f"- Scallop — {fmt_money(scallop_total)} *(not yet integrated)*")
-    head.append(f"- Navi — {fmt_money(navi_total)} *(not yet integrated)*")
+    head.append(f"- Suilend — {fmt_money(t['suilend'])}")
+    head.append(f"- Scallop — {fmt_money(t['scallop'])} *(not yet integrated)*")
+    head.append(f"- Navi — {fmt_money(t['navi'])} *(not yet integrated)*")
     head.append("")
     head.append("## Vaults")
-    head.append(f"- Aftermath Finance — {fmt_money(vaults_aftermath)} *(not yet integrated)*")
-    head.append(f"- Cetus — {fmt_money(vaults_cetus)} *(not yet integrated)*")
+    head.append(f"- Aftermath Finance — {fmt_money(t['aftermath'])} *(not yet integrated)*")
+    head.append(f"- Cetus — {fmt_money(t['cetus'])} *(not yet integrated)*")
     head.append("")
+    return "\n".join(head)
+
+
+def render_header_html(data: dict) -> str:
+    t = _totals(data)
+    return "\n".join([
+        "<!DOCTYPE html>",
+        '<html lang="en">',
+        '<head><meta charset="utf-8"><title>Portfolio report</title>',
+        "<style>table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px}"
+        "td.num{text-align:right}</style></head>",
+        "<body>",
+        "<h1>Portfolio report</h1>",
+        f"<p><strong>As of:</strong> {escape(str(data.get('date_iso', '-')))}<br>",
+        f"<strong>Totals (USD):</strong> wallet={escape(fmt_money(t['wallet']))}, "
+        f"lending={escape(fmt_money(t['lending']))}, vaults={escape(fmt_money(t['vaults']))}, "
+        f"<strong>portfolio={escape(fmt_money(t['portfolio']))}</strong></p>",
+        "<h2>Lending</h2>",
+        "<ul>",
+        f"<li>Suilend — {escape(fmt_money(t['suilend']))}</li>",
+        f"<li>Scallop — {escape(fmt_money(t['scallop']))} <em>(not yet integrated)</em></li>",
+        f"<li>Navi — {escape(fmt_money(t['navi']))} <em>(not yet integrated)</em></li>",
+        "</ul>",
+        "<h2>Vaults</h2>",
+        "<ul>",
+        f"<li>Aftermath Finance — {escape(fmt_money(t['aftermath']))} <em>(not yet integrated)</em></li>",
+        f"<li>Cetus — {escape(fmt_money(t['cetus']))} <em>(not yet integrated)</em></li>",
+        "</ul>",
+        "",
+    ])
+
+
+FORMATS = {
+    'markdown': (render_header_markdown, render_account_markdown),
+    'html': (render_header_html, render_account_html),
+}
+
+
+class SectionCache:
+    """Rendered account sections in SQLite, keyed by ``account_key``.
+
+    ``prune`` drops the sections of this format that the last report did not
+    use, so the cache holds one entry per account and format.
+    """
+
+    def __init__(self, path: Path, fmt: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sections (key TEXT PRIMARY KEY, format TEXT NOT NULL, body TEXT NOT NULL)"
+        )
+        self.used: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        self.used.add(key)
+        row = self.conn.execute("SELECT body FROM sections WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO sections VALUES (?, ?, ?)", (key, self.fmt, text))
+
+    def prune(self) -> None:
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS used (key TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM used")
+        self.conn.executemany("INSERT OR IGNORE INTO used VALUES (?)", ((k,) for k in self.used))
+        self.conn.execute(
+            "DELETE FROM sections WHERE format = ? AND key NOT IN (SELECT key FROM used)", (self.fmt,)
+        )
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+class _RstripWriter:
+    """Write to ``out`` holding back trailing whitespace, as ``str.rstrip`` on the whole text would."""
+
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self.pending = ""
+
+    def write(self, text: str) -> None:
+        stripped = text.rstrip()
+        if stripped:
+            self.out.write(self.pending + stripped)
+            self.pending = text[len(stripped):]
+        else:
+            self.pending += text
+
+
+def write_report(out: TextIO, data: dict, fmt: str = 'markdown', cache: SectionCache | None = None) -> None:
+    """Stream the report for a ``latest.json`` payload to ``out``, one section at a time.
+
+    Account sections come from ``cache`` when the account's rendered data is
+    unchanged; the rest are rendered and stored.
+    """
+    render_header, render_account = FORMATS[fmt]
+    if fmt == 'html':
+        writer: TextIO | _RstripWriter = out
+        if not data:
+            out.write("<!DOCTYPE html>\n<html><body><h1>Portfolio report</h1><p>Latest file not found.</p></body></html>\n")
+            return
+    else:
+        writer = _RstripWriter(out)
+        if not data:
+            out.write("# Portfolio report Latest file not found.")
+            return
+
+    writer.write(render_header(data))
+    accounts = data.get('accounts', [])
+    if fmt != 'html' and accounts:
+        writer.write("\n")
+    for acc in accounts:
+        key = account_key(acc, fmt) if cache is not None else None
+        section = cache.get(key) if cache is not None and key is not None else None
+        if section is None:
+            section = render_account(acc)
+            if cache is not None and key is not None:
+                cache.put(key, section)
+        writer.write(section if fmt == 'html' else "\n" + section)
+    if fmt == 'html':
+        out.write("</body>\n</html>\n")
+    else:
+        out.write("\n")
 
-    sections: list[str] = head + [""] + per_account_sections if per_account_sections else head
-    return "\n".join(sections).rstrip() + "\n"
+
+def build_report(latest_json_path: str | Path = 'data/latest.json') -> str:
+    buf = io.StringIO()
+    write_report(buf, load_json(latest_json_path))
+    return buf.getvalue()
+
+
+def render_to_file(
+    latest_json_path: str | Path,
+    output: str | Path,
+    fmt: str = 'markdown',
+    cache_path: Path | None = CACHE_PATH,
+) -> SectionCache | None:
+    """Stream the report into ``output`` (replaced atomically); return the cache used."""
+    output = Path(output)
+    cache = SectionCache(cache_path, fmt) if cache_path is not None else None
+    tmp = output.with_name(output.name + ".tmp")
+    try:
+        with tmp.open("w") as f:
+            write_report(f, load_json(latest_json_path), fmt, cache)
+        os.replace(tmp, output)
+        if cache is not None:
+            cache.prune()
+    finally:
+        if cache is not None:
+            cache.close()
+    return cache
 
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Render a Markdown summary from data/latest.json",
+        description="Render a Markdown (or HTML) summary from data/latest.json",
     )
     parser.add_argument(
         "--input",
@@ -144,7 +404,24 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         "--output",
         "-o",
         type=Path,
-        help="Optional path to write the Markdown report (default: print to stdout)",
+        help="Optional path to write the report (default: print to stdout)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default="markdown",
+        help="Report format (default: markdown)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=CACHE_PATH,
+        help=f"SQLite file of cached account sections (default: {CACHE_PATH or 'no cache'})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Render every account section from scratch",
     )
     parser.add_argument(
         "--no-print",
@@ -156,13 +433,22 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
 
 def main(argv: list[str] | None = None) -> int:
     args = parse_args(argv)
-    report = build_report(args.input)
+    cache_path = None if args.no_cache else args.cache
 
     if args.output:
-        args.output.write_text(report)
-
-    if not args.no_print:
-        sys.stdout.write(report)
+        render_to_file(args.input, args.output, args.format, cache_path)
+        if not args.no_print:
+            with args.output.open() as f:
+                shutil.copyfileobj(f, sys.stdout)
+    elif not args.no_print:
+        cache = SectionCache(cache_path, args.format) if cache_path is not None else None
+        try:
+            write_report(sys.stdout, load_json(args.input), args.format, cache)
+            if cache is not None:
+                cache.prune()
+        finally:
+            if cache is not None:
+                cache.close()
 
     return 0
 
@@ -16,28 +16,64 @@ def load_latest() -> dict:
     return json.loads(LATEST_JSON.read_text())
 
 
-def append_unique_row(path: Path, fieldnames: list[str], row: dict[str, object], key_fields: list[str]) -> bool:
-    existing_keys: set[tuple[str, ...]] = set()
-    if path.exists():
-        with path.open(newline="") as f:
-            for item in csv.DictReader(f):
-                existing_keys.add(tuple(str(item.get(k, "")) for k in key_fields))
+def load_keys(path: Path, key_fields: list[str]) -> set[tuple[str, ...]]:
+    """Read the key columns of ``path`` once and return the set of existing keys."""
+    keys: set[tuple[str, ...]] = set()
+    if not path.exists():
+        return keys
+    with path.open(newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        idx = [header.index(k) if k in header else None for k in key_fields]
+        for item in reader:
+            keys.add(tuple(item[i] if i is not None and i < len(item) else "" for i in idx))
+    return keys
+
 
-    key = tuple(str(row.get(k, "")) for k in key_fields)
-    if key in existing_keys:
-        return False
+def append_unique_rows(
+    path: Path,
+    fieldnames: list[str],
+    rows: list[dict[str, object]],
+    key_fields: list[str],
+) -> int:
+    """Append the rows of ``rows`` whose key is not in ``path`` yet; return how many.
+
+    Existing keys are loaded once per call and all new rows go out in a single
+    write, so a snapshot costs one pass over the file instead of one per row.
+    """
+    existing_keys = load_keys(path, key_fields)
+    new_rows: list[dict[str, object]] = []
+    for row in rows:
+        key = tuple(str(row.get(k, "")) for k in key_fields)
+        if key in existing_keys:
+            continue
+        existing_keys.add(key)
+        new_rows.append(row)
+    if not new_rows:
+        return 0
 
     write_header = not path.exists()
     with path.open("a", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         if write_header:
             writer.writeheader()
-        writer.writerow(row)
-    return True
+        writer.writerows(new_rows)
+    return len(new_rows)
+
+
+def append_unique_row(path: Path, fieldnames: list[str], row: dict[str, object], key_fields: list[str]) -> bool:
+    return append_unique_rows(path, fieldnames, [row], key_fields) == 1
 
 
-def main() -> None:
-    latest = load_latest()
+def main(latest: dict | None = None) -> None:
+    """Append ``latest`` (default: ``data/latest.json``) to the history CSVs.
+
+    Callers that just collected a snapshot pass it in: ``latest.json`` is not
+    rewritten when only timestamps changed, so its ``date_iso`` can be older
+    than the run whose rows ``persist`` appended to the per-address CSVs.
+    """
+    if latest is None:
+        latest = load_latest()
     date_iso = latest.get("date_iso", "")
     totals = latest.get("totals_usd", {})
 
@@ -53,12 +89,11 @@ def main() -> None:
         ["date_iso"],
     )
 
+    asset_rows: list[dict[str, object]] = []
     for account in latest.get("accounts", []):
         address = account.get("address", "")
         for bal in account.get("balances", []):
-            append_unique_row(
-                ASSETS_CSV,
-                ["date_iso", "address", "symbol", "coin_type", "human_balance", "usd_value"],
+            asset_rows.append(
                 {
                     "date_iso": date_iso,
                     "address": address,
@@ -66,9 +101,14 @@ def main() -> None:
                     "coin_type": bal.get("coin_type", ""),
                     "human_balance": bal.get("human_balance", ""),
                     "usd_value": bal.get("usd_value", ""),
-                },
-                ["date_iso", "address", "coin_type"],
+                }
             )
+    append_unique_rows(
+        ASSETS_CSV,
+        ["date_iso", "address", "symbol", "coin_type", "human_balance", "usd_value"],
+        asset_rows,
+        ["date_iso", "address", "coin_type"],
+    )
 
 
 if __name__ == "__main__":